@@ -0,0 +1,44 @@
+"""added game daily stats progress table
+
+Revision ID: f1c8b3e6a2d9
+Revises: e5a9c4d2f1b7
+Create Date: 2026-10-18 14:21:37.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c8b3e6a2d9'
+down_revision: Union[str, None] = 'e5a9c4d2f1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('game_daily_stats_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('max_session_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('id = 1', name='ck_game_daily_stats_progress_single_row'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Carry the high-water mark over from the daily rows
+    op.execute("""
+        INSERT INTO game_daily_stats_progress (id, max_session_id, updated_at)
+        SELECT 1, MAX(max_session_id), MAX(refreshed_at) FROM daily_activity_stats
+        HAVING MAX(max_session_id) IS NOT NULL
+    """)
+    op.drop_column('daily_activity_stats', 'max_session_id')
+
+
+def downgrade() -> None:
+    op.add_column('daily_activity_stats', sa.Column('max_session_id', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE daily_activity_stats SET max_session_id = (SELECT max_session_id FROM game_daily_stats_progress)
+        WHERE stat_date = (SELECT MAX(stat_date) FROM daily_activity_stats)
+    """)
+    op.drop_table('game_daily_stats_progress')
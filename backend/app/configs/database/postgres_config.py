@@ -3,6 +3,8 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import ProgrammingError
@@ -14,11 +16,31 @@ POSTGRES_URL = os.getenv('POSTGRES_URL',"sqlite:///./test.db")
 POSTGRES_URL_RDS = os.getenv('POSTGRES_URL_RDS',"sqlite:///./test.db")
 DB_NAME = os.getenv('POSTGRES_DB')
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    "Function to map a sync database URL onto its asyncio driver"
+    database_url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(database_url.drivername, database_url.drivername)
+    return database_url.set(drivername=drivername).render_as_string(hide_password=False)
+
+POSTGRES_URL_RDS_ASYNC = os.getenv('POSTGRES_URL_RDS_ASYNC', get_async_database_url(POSTGRES_URL_RDS))
+
 # Create engine without specifying the database name (for creating the database if not exists)
 engine_without_db = create_engine(POSTGRES_URL_RDS.rsplit('/', 1)[0])
 engine = create_engine(POSTGRES_URL_RDS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine used by the API routes, the sync engine above stays for Alembic and scripts
+async_engine = create_async_engine(POSTGRES_URL_RDS_ASYNC)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 def create_database_if_not_exists():
@@ -45,4 +67,10 @@ def get_postgres_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_postgres_db():
+    "Function to create an async session for the database"
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
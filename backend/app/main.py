@@ -1,12 +1,21 @@
+import asyncio
+
 from fastapi import FastAPI
-from apscheduler.schedulers.asyncio import AsyncIOScheduler # type: ignore
 from contextlib import asynccontextmanager
 
 from app.routes.user_routes import router as user_router
 from app.routes.game_routes import router as game_router
 from app.routes.game_session_routes import router as game_session_router
 from app.routes.leaderboard_routes import router as leaderboard_router
-from app.utils.utils import get_game_popularity_index
+from app.routes.scheduler_routes import router as scheduler_router
+from app.routes.admin_routes import router as admin_router
+from app.utils.utils import get_game_popularity_index, archive_leaderboards, flush_upvotes, popularity_executor
+from app.services.leaderboard_archive_service import LEADERBOARD_ARCHIVE_INTERVAL_MINUTES
+from app.services.game_upvote_service import GAME_UPVOTE_FLUSH_SECONDS
+from app.services.game_session_ingest_service import GAME_SESSION_INGEST_MODE, run_game_session_ingest
+from app.utils.scheduler import scheduler, lease, LEASE_RENEW_SECONDS
+from app.utils.cache import listen_for_invalidations
+from app.utils.push import leaderboard_hub
 
 "Initializing the main App"
 app = FastAPI()
@@ -16,18 +25,33 @@ app.include_router(user_router, prefix="/api/v1")
 app.include_router(game_router, prefix="/api/v1")
 app.include_router(game_session_router, prefix="/api/v1")
 app.include_router(leaderboard_router, prefix="/api/v1")
-
-"""Scheduler to run Popularity Index fetching logic after every 5 minutes"""
-scheduler = AsyncIOScheduler()
+app.include_router(scheduler_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Handle startup and shutdown of scheduler to fetch latest popularity index from server."""
-    scheduler.add_job(get_game_popularity_index, "interval", minutes=5)
+    """Handle startup and shutdown of scheduler to fetch latest popularity index from server.
+    Every instance runs the scheduler, the jobs themselves only run on the lease holder."""
+    await lease.heartbeat()
+    scheduler.add_job(lease.heartbeat, "interval", seconds=LEASE_RENEW_SECONDS, id="scheduler_lease")
+    scheduler.add_job(get_game_popularity_index, "interval", minutes=5, max_instances=1, coalesce=True, id="popularity_index")
+    scheduler.add_job(archive_leaderboards, "interval", minutes=LEADERBOARD_ARCHIVE_INTERVAL_MINUTES, max_instances=1, coalesce=True, id="leaderboard_archive")
+    scheduler.add_job(flush_upvotes, "interval", seconds=GAME_UPVOTE_FLUSH_SECONDS, max_instances=1, coalesce=True, id="upvote_flush")
     scheduler.start()
     print("Scheduler started ✅")
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
+    leaderboard_push = asyncio.create_task(leaderboard_hub.run())
+    game_session_ingest = asyncio.create_task(run_game_session_ingest()) if GAME_SESSION_INGEST_MODE == "stream" else None
     yield
+    if game_session_ingest:
+        game_session_ingest.cancel()
+        # Let the consumer leave the group before the Redis client goes away
+        await asyncio.gather(game_session_ingest, return_exceptions=True)
+    leaderboard_push.cancel()
+    invalidation_listener.cancel()
     scheduler.shutdown()
+    await lease.release()
+    popularity_executor.shutdown(wait=False, cancel_futures=True)
     print("Scheduler shut down 🛑")
 
 app.router.lifespan_context = lifespan
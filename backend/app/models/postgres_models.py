@@ -1,7 +1,7 @@
 "Model Configuration Module for Postgres DB"
 from enum import Enum
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import CheckConstraint, Column, Integer, String, ForeignKey, DateTime, Date, Float, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 
 from ..configs.database.postgres_config import Base
@@ -41,6 +41,19 @@ class GameModel(Base):
 class GameSessionModel(Base):
     "Game Score Model Class"
     __tablename__ = "game_session"
+    __table_args__ = (
+        UniqueConstraint("event_id", name="uq_game_session_event_id"),
+        Index("ix_game_session_game_id_user_id_game_status", "game_id", "user_id", "game_status"),
+        Index("ix_game_session_game_id_start_time", "game_id", "start_time"),
+        Index("ix_game_session_start_time", "start_time"),
+        # A user has at most one active session per game, join relies on it instead of a pre-query
+        Index(
+            "uq_game_session_active_game_id_user_id", "game_id", "user_id",
+            unique=True,
+            postgresql_where=text("game_status = 'STARTED'"),
+            sqlite_where=text("game_status = 'STARTED'")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -49,6 +62,8 @@ class GameSessionModel(Base):
     end_time = Column(DateTime)
     game_status = Column(String, default=GameStatus.STARTED.value)
     score = Column(Integer)
+    # Set by the stream ingest worker, makes redelivered join events idempotent
+    event_id = Column(String, nullable=True)
 
     users = relationship("UserModel", back_populates="game_session")
     games = relationship("GameModel", back_populates="game_session")
@@ -63,4 +78,56 @@ class GameStatusModel(Base):
     number_of_users_joined = Column(Integer, default=0)
     status = Column(String, default=GameStatus.STARTED.value)
 
-    games = relationship("GameModel", back_populates="games_status")
\ No newline at end of file
+    games = relationship("GameModel", back_populates="games_status")
+
+class GameDailyStatsModel(Base):
+    "Daily activity rollup per game, recomputed from game_session by the Popularity Index job"
+    __tablename__ = "game_daily_stats"
+    __table_args__ = (UniqueConstraint("game_id", "stat_date", name="uq_game_daily_stats_game_id_stat_date"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    game_id = Column(Integer, ForeignKey('games.id'), nullable=False)
+    stat_date = Column(Date, nullable=False, index=True)
+    distinct_players = Column(Integer, default=0)
+    completed_sessions = Column(Integer, default=0)
+    max_session_seconds = Column(Float, default=0)
+    refreshed_at = Column(DateTime, default=datetime.now)
+
+class DailyActivityStatsModel(Base):
+    "Daily activity rollup across all games, used to normalize the Popularity Index"
+    __tablename__ = "daily_activity_stats"
+
+    stat_date = Column(Date, primary_key=True)
+    distinct_players = Column(Integer, default=0)
+    refreshed_at = Column(DateTime, default=datetime.now, index=True)
+
+class GameDailyStatsProgressModel(Base):
+    "Single row holding the highest game_session id seen by the last rollup run, its high-water mark"
+    __tablename__ = "game_daily_stats_progress"
+    __table_args__ = (CheckConstraint("id = 1", name="ck_game_daily_stats_progress_single_row"),)
+
+    id = Column(Integer, primary_key=True, default=1)
+    max_session_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now)
+
+class UpvoteFlushModel(Base):
+    "Upvote flushes committed to games.upvotes, so a flush retried after its commit is not added twice"
+    __tablename__ = "upvote_flushes"
+
+    flush_id = Column(String, primary_key=True)
+    flushed_at = Column(DateTime, default=datetime.now, index=True)
+
+class LeaderboardArchiveModel(Base):
+    "Top entries of closed daily and monthly Leaderboards, copied out of Redis before they expire"
+    __tablename__ = "leaderboard_archive"
+    __table_args__ = (
+        UniqueConstraint("board_key", "rank", name="uq_leaderboard_archive_board_key_rank"),
+        Index("ix_leaderboard_archive_board_key_user_id", "board_key", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    board_key = Column(String, nullable=False)
+    rank = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    archived_at = Column(DateTime, default=datetime.now)
@@ -0,0 +1,53 @@
+"""Routing Module for Admin Operations"""
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from redis.exceptions import RedisError # type: ignore
+
+from ..services.game_session_ingest_service import get_game_session_ingest_status
+from ..services.leaderboard_rebuild_service import acquire_rebuild_lock, get_rebuild_progress, rebuild_leaderboards_service
+
+
+router = APIRouter()
+
+"Running rebuild task, referenced so it is not garbage collected"
+rebuild_task = None
+
+
+async def run_rebuild():
+    try:
+        await rebuild_leaderboards_service()
+    except Exception:
+        # The failure is recorded in the rebuild progress
+        pass
+
+
+@router.post("/admin/leaderboards/rebuild", status_code=202)
+async def rebuild_leaderboards():
+    """Route to rebuild the Redis Leaderboards from the game sessions in the background"""
+    global rebuild_task
+    try:
+        await acquire_rebuild_lock()
+        rebuild_task = asyncio.create_task(run_rebuild())
+        return await get_rebuild_progress()
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
+
+
+@router.get("/admin/leaderboards/rebuild")
+async def leaderboard_rebuild_progress():
+    """Route to fetch the progress and throughput of the last Leaderboard rebuild"""
+    try:
+        return await get_rebuild_progress()
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
+
+
+@router.get("/admin/game-sessions/ingest")
+async def game_session_ingest_status():
+    """Route to fetch the consumer lag, pending events and batch metrics of the game session ingest stream"""
+    try:
+        return await get_game_session_ingest_status()
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
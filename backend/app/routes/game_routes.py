@@ -3,13 +3,13 @@
 import redis.asyncio as aioredis # type: ignore
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..configs.database.postgres_config import get_postgres_db
+from ..configs.database.postgres_config import get_async_postgres_db
 from ..configs.redis.redis import get_redis_client
-from ..models.postgres_models import GameModel, GameStatusModel
 from ..schemas.postgres_schema import GameCreate, GameResponse, GameStatusResponse
 from ..services.game_service import create_game_service, start_game_service, end_game_service, upvote_game_service
+from ..services.game_registry_service import get_registered_game, get_active_game_status
 
 
 router = APIRouter()
@@ -18,7 +18,7 @@ router = APIRouter()
 @router.post("/games", response_model=GameResponse)
 async def create_game(
     game: GameCreate, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
     """Route to create a New Game"""
     response = await create_game_service(game, db)
@@ -28,17 +28,12 @@ async def create_game(
 @router.post("/games/{game_id}/start", response_model=GameStatusResponse)
 async def start_game(
     game_id: int, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
     """Route to Start a Game"""
-    game = db.query(GameModel).filter(GameModel.id == game_id).first()
-    if not game:
+    if not await get_registered_game(game_id):
         raise HTTPException(status_code=404, detail="Game not found")
-    game_is_active = db.query(GameStatusModel).filter(
-        GameStatusModel.game_id == game_id,
-        GameStatusModel.status == "STARTED"
-    ).first()
-    if game_is_active:
+    if await get_active_game_status(game_id):
         raise HTTPException(status_code=404, detail="Game has started already.")
     response = await start_game_service(game_id, db)
     return response
@@ -47,29 +42,27 @@ async def start_game(
 @router.post("/games/{game_id}/end", response_model=GameStatusResponse)
 async def end_game(
     game_id: int, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
     """Route to End an active Game"""
-    game = db.query(GameModel).filter(GameModel.id == game_id).first()
-    if not game:
+    if not await get_registered_game(game_id):
         raise HTTPException(status_code=404, detail="Game not found")
-    db_game = db.query(GameStatusModel).filter(GameStatusModel.game_id == game_id, GameStatusModel.status == "STARTED").first()
-    if not db_game:
+    active_status = await get_active_game_status(game_id)
+    if not active_status:
         raise HTTPException(status_code=404, detail="The game has not started yet.")
-    response = await end_game_service(db_game, db)
+    response = await end_game_service(active_status["id"], db)
     return response
 
 
 @router.post("/games/{game_id}/upvote", response_model=GameResponse)
 async def upvote_game(
-    game_id: int, 
-    db: Session = Depends(get_postgres_db)
+    game_id: int
     ):
     """Route to Upvote a Game"""
-    game = db.query(GameModel).filter(GameModel.id == game_id).first()
+    game = await get_registered_game(game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    response = await upvote_game_service(game, db)
+    response = await upvote_game_service(game)
     return response
 
 
@@ -2,73 +2,86 @@
 
 import redis.asyncio as aioredis # type: ignore
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Union
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
+from redis.exceptions import RedisError # type: ignore
 
-from ..configs.database.postgres_config import get_postgres_db
+from ..configs.database.postgres_config import get_async_postgres_db
 from ..configs.redis.redis import get_redis_client
-from ..models.postgres_models import GameSessionModel, UserModel, GameModel, GameStatusModel
-from ..schemas.postgres_schema import GameSessionResponse
+from ..schemas.postgres_schema import GameSessionEventResponse, GameSessionResponse
 from ..services.game_session_service import create_game_session_service, update_game_session_service
+from ..services.game_session_ingest_service import GAME_SESSION_INGEST_MODE, queue_exit_event, queue_join_event
+from ..services.user_profile_service import get_user_profiles
+from ..services.game_registry_service import get_registered_game, get_active_game_status
 
 
 router = APIRouter()
 
 
-@router.post("/games/{game_id}/join", response_model=GameSessionResponse)
+@router.post("/games/{game_id}/join", response_model=Union[GameSessionResponse, GameSessionEventResponse])
 async def join_game(
     game_id: int, 
     user_id: int, 
-    db: Session = Depends(get_postgres_db), 
+    response: Response,
+    db: AsyncSession = Depends(get_async_postgres_db), 
     redis: aioredis.Redis = Depends(get_redis_client)
     ):
     """Routing Module to Join an active Game"""
+    if GAME_SESSION_INGEST_MODE == "stream":
+        return await queue_join_game(game_id, user_id, response)
     try:
-        if not db.query(UserModel).filter(UserModel.id == user_id).first():
-            raise HTTPException(status_code=404, detail="User not found")
-        if not db.query(GameModel).filter(GameModel.id == game_id).first():
-            raise HTTPException(status_code=404, detail="Game not found")
-        
-        game_activity_status = db.query(GameStatusModel).filter(
-            GameStatusModel.game_id == game_id,
-            GameStatusModel.status == "STARTED").first()
-        if not game_activity_status:
-            raise HTTPException(status_code=404, detail="Game has ended.")
-        
-        if db.query(GameSessionModel).filter(
-            GameSessionModel.game_id == game_id,
-            GameSessionModel.user_id == user_id,
-            GameSessionModel.game_status == "STARTED"
-        ).first():
-            raise HTTPException(status_code=404, detail="An active game session exists. Please go back to the game or end the previous game session to start a new one.")
-    except SQLAlchemyError as e:
-        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    response = await create_game_session_service(user_id, game_id, game_activity_status, db)
+        game = await get_registered_game(game_id)
+        game_activity_status = await get_active_game_status(game_id)
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    if not game_activity_status:
+        raise HTTPException(status_code=404, detail="Game has ended.")
+    # Unknown users and a second active session are rejected by the constraints of game_session
+    response = await create_game_session_service(user_id, game_id, game_activity_status["id"], db)
     return response
     
 
-@router.put("/games/{game_id}/exit", response_model=GameSessionResponse)
+@router.put("/games/{game_id}/exit", response_model=Union[GameSessionResponse, GameSessionEventResponse])
 async def exit_game(
     game_id: int, 
     user_id: int, 
-    db: Session = Depends(get_postgres_db), 
+    response: Response,
+    db: AsyncSession = Depends(get_async_postgres_db), 
     redis: aioredis.Redis = Depends(get_redis_client)
     ):
     """Routing Module to Exit a Game"""
+    if GAME_SESSION_INGEST_MODE == "stream":
+        try:
+            event = await queue_exit_event(user_id, game_id)
+        except SQLAlchemyError as e:
+            raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+        except RedisError as e:
+            raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+        response.status_code = 202
+        return event
+    response = await update_game_session_service(game_id, user_id, db)
+    return response
+
+
+async def queue_join_game(game_id: int, user_id: int, response: Response):
+    """Join through the ingest stream, validating against the Redis registry and profiles only"""
     try:
-        game_session = db.query(GameSessionModel).filter(
-            GameSessionModel.game_id == game_id,
-            GameSessionModel.user_id == user_id,
-            GameSessionModel.game_status == "STARTED"
-        ).first()
-        if not game_session:
-            raise HTTPException(status_code=404, detail="Game session not found")
+        # Unknown users are cached as an empty profile
+        if not (await get_user_profiles([user_id])).get(user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+        if not await get_registered_game(game_id):
+            raise HTTPException(status_code=404, detail="Game not found")
+        game_activity_status = await get_active_game_status(game_id)
+        if not game_activity_status:
+            raise HTTPException(status_code=404, detail="Game has ended.")
+        event = await queue_join_event(user_id, game_id, game_activity_status["id"])
     except SQLAlchemyError as e:
-        raise HTTPException(status_code=400, detail=f"Database Error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    response = await update_game_session_service(game_session, db)
-    return response
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail=f"Redis error: {str(e)}")
+    response.status_code = 202
+    return event
@@ -2,47 +2,211 @@
 
 import redis.asyncio as aioredis # type: ignore
 
+from datetime import date as Date, datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket
 
 from ..configs.redis.redis import get_redis_client
-from ..configs.database.postgres_config import get_postgres_db
-from ..models.postgres_models import GameModel
-from ..schemas.postgres_schema import LeaderboardResponse
-from ..services.leaderboard_service import global_leaderboard_service, game_leaderboard_service
+from ..schemas.postgres_schema import LeaderboardResponse, UserRankResponse, BatchLeaderboardRequest, BoardLeaderboardResponse, PercentileResponse
+from ..services.leaderboard_service import global_leaderboard_service, game_leaderboard_service, encode_leaderboard_cursor, user_rank_service, leaderboard_cache_stats_service, range_leaderboard_key_service, leaderboard_snapshot_service, batch_leaderboard_service, MAX_RANGE_DAYS
+from ..services.leaderboard_percentile_service import percentile_service
+from ..services.user_profile_service import enrich_leaderboard, enrich_leaderboards
+from ..services.game_registry_service import get_registered_game, get_registered_games
+from ..utils.cache import LEADERBOARD_SNAPSHOT_MAX_LIMIT
+from ..utils.push import stream_leaderboard
+from ..utils.utils import get_game_leaderboard_keys
 
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
+MAX_NEIGHBOURS = 50
 
-@router.get("/leaderboard/global", response_model=List[LeaderboardResponse])
+
+def set_next_cursor(response: Response, leaderboard: list, limit: int, around_user_id: Optional[int]):
+    """Expose the cursor of the next page when the current page is full"""
+    if around_user_id is None and len(leaderboard) == limit:
+        last = leaderboard[-1]
+        response.headers["X-Next-Cursor"] = encode_leaderboard_cursor(last["user_id"], last["score"])
+
+
+def validate_page_mode(cursor: Optional[str], around_user_id: Optional[int]):
+    """A page is addressed either by offset/cursor or around a user, not both"""
+    if cursor and around_user_id is not None:
+        raise HTTPException(status_code=400, detail="Use either cursor or around_user_id, not both")
+
+
+def uses_snapshot(offset: int, limit: int, cursor: Optional[str], around_user_id: Optional[int], from_date, to_date, window_days, include_profile: bool) -> bool:
+    """Top pages of versioned boards are served from the pre-rendered snapshots.
+
+    Range boards are merged on read and have no version counter, so they always go through Redis.
+    Snapshots hold no profile fields, enriched pages are rendered per request.
+    """
+    return (
+        not include_profile and offset == 0 and not cursor and around_user_id is None and limit <= LEADERBOARD_SNAPSHOT_MAX_LIMIT
+        and from_date is None and to_date is None and window_days is None
+    )
+
+
+def snapshot_response(body: bytes, next_cursor: Optional[str]) -> Response:
+    """Return the snapshot bytes as they are, skipping response model validation"""
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def resolve_leaderboard_key(prefix: str, date: Optional[str], from_date: Optional[Date], to_date: Optional[Date], window_days: Optional[int], redis):
+    """Pick the board a request reads: all-time, one day, or a merged date range"""
+    if from_date is None and to_date is None and window_days is None:
+        return f"{prefix}_{date}" if date else prefix
+    if date or (window_days is not None and (from_date or to_date)):
+        raise HTTPException(status_code=400, detail="Use either date, from/to or window_days")
+    today = datetime.today().date()
+    if window_days is not None:
+        return await range_leaderboard_key_service(prefix, today - timedelta(days=window_days - 1), today, redis)
+    if from_date is None:
+        raise HTTPException(status_code=400, detail="from is required when to is given")
+    return await range_leaderboard_key_service(prefix, from_date, to_date or today, redis)
+
+
+@router.get("/leaderboard/global", response_model=List[LeaderboardResponse], response_model_exclude_unset=True)
 async def get_global_leaderboard(
+    response: Response,
     date: Optional[str] = None, 
+    from_date: Optional[Date] = Query(None, alias="from"),
+    to_date: Optional[Date] = Query(None, alias="to"),
+    window_days: Optional[int] = Query(None, ge=1, le=MAX_RANGE_DAYS),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    around_user_id: Optional[int] = None,
+    neighbours: int = Query(5, ge=0, le=MAX_NEIGHBOURS),
+    include_profile: bool = False,
     redis: aioredis.Redis = Depends(get_redis_client)
     ):
     """Route to fetch Global Leaderboard"""
-    if date:
-        global_leaderboard = f"global_leaderboard_{date}"
-    else:
-        global_leaderboard = "global_leaderboard"
-    response = await global_leaderboard_service(global_leaderboard, redis)
-    return response
+    validate_page_mode(cursor, around_user_id)
+    global_leaderboard = await resolve_leaderboard_key("global_leaderboard", date, from_date, to_date, window_days, redis)
+    if uses_snapshot(offset, limit, cursor, around_user_id, from_date, to_date, window_days, include_profile):
+        body, next_cursor = await leaderboard_snapshot_service(global_leaderboard, redis, limit, "No global leaderboard data found")
+        return snapshot_response(body, next_cursor)
+    leaderboard = await global_leaderboard_service(global_leaderboard, redis, offset, limit, cursor, around_user_id, neighbours)
+    set_next_cursor(response, leaderboard, limit, around_user_id)
+    if include_profile:
+        leaderboard = await enrich_leaderboard(leaderboard)
+    return leaderboard
     
-@router.get("/leaderboard/{game_id}", response_model=List[LeaderboardResponse])
+@router.get("/leaderboard/cache/stats")
+async def get_leaderboard_cache_stats():
+    """Route to fetch the hit/miss counters of this instance's Leaderboard cache"""
+    return leaderboard_cache_stats_service()
+
+
+@router.post("/leaderboard/batch", response_model=List[BoardLeaderboardResponse], response_model_exclude_unset=True)
+async def get_batch_leaderboards(
+    batch: BatchLeaderboardRequest,
+    redis: aioredis.Redis = Depends(get_redis_client)
+    ):
+    """Route to fetch the top of many Game Leaderboards in a single request"""
+    games = await get_registered_games(list({board.game_id for board in batch.boards}))
+    missing = sorted({board.game_id for board in batch.boards if board.game_id not in games})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Games not found: {missing}")
+    boards = [
+        (f"game_{board.game_id}_leaderboard_{board.date}" if board.date else f"game_{board.game_id}_leaderboard", board.limit or batch.limit)
+        for board in batch.boards
+    ]
+    leaderboards = await batch_leaderboard_service(boards, redis)
+    if batch.include_profile:
+        leaderboards = await enrich_leaderboards(leaderboards)
+    return [
+        {"game_id": board.game_id, "date": board.date, "leaderboard": leaderboard}
+        for board, leaderboard in zip(batch.boards, leaderboards)
+    ]
+
+
+@router.get("/leaderboard/global/percentile", response_model=PercentileResponse)
+async def get_global_percentile(
+    user_id: int,
+    date: Optional[str] = None,
+    redis: aioredis.Redis = Depends(get_redis_client)
+    ):
+    """Route to estimate which top percentage of the Global Leaderboard a user is in"""
+    response = await percentile_service(f"global_leaderboard_{date}" if date else "global_leaderboard", user_id, redis)
+    return response
+
+
+@router.get("/leaderboard/{game_id}/percentile", response_model=PercentileResponse)
+async def get_game_percentile(
+    game_id: int,
+    user_id: int,
+    date: Optional[str] = None,
+    redis: aioredis.Redis = Depends(get_redis_client)
+    ):
+    """Route to estimate which top percentage of a Game Leaderboard a user is in"""
+    if not await get_registered_game(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    response = await percentile_service(f"game_{game_id}_leaderboard_{date}" if date else f"game_{game_id}_leaderboard", user_id, redis)
+    return response
+
+
+@router.websocket("/leaderboard/global/live")
+async def live_global_leaderboard(websocket: WebSocket, date: Optional[str] = None):
+    """WebSocket Route pushing the changes of the Global Leaderboard's top entries"""
+    await stream_leaderboard(websocket, f"global_leaderboard_{date}" if date else "global_leaderboard")
+
+
+@router.websocket("/leaderboard/{game_id}/live")
+async def live_game_leaderboard(websocket: WebSocket, game_id: int, date: Optional[str] = None):
+    """WebSocket Route pushing the changes of a Game Leaderboard's top entries"""
+    if not await get_registered_game(game_id):
+        # 1008 Policy Violation, there is no such board to subscribe to
+        await websocket.close(code=1008)
+        return
+    await stream_leaderboard(websocket, f"game_{game_id}_leaderboard_{date}" if date else f"game_{game_id}_leaderboard")
+
+
+@router.get("/leaderboard/users/{user_id}", response_model=List[UserRankResponse])
+async def get_user_ranks(
+    user_id: int,
+    game_ids: List[int] = Query([]),
+    date: Optional[str] = None,
+    redis: aioredis.Redis = Depends(get_redis_client)
+    ):
+    """Route to fetch a user's rank and score on the global, game and dated Leaderboards"""
+    date = date or str(datetime.today().date())
+    keys = ["global_leaderboard", f"global_leaderboard_{date}"]
+    for game_id in game_ids:
+        keys.extend(key for key in get_game_leaderboard_keys(game_id, date) if key not in keys)
+    response = await user_rank_service(user_id, keys, redis)
+    return response
+
+
+@router.get("/leaderboard/{game_id}", response_model=List[LeaderboardResponse], response_model_exclude_unset=True)
 async def get_game_leaderboard(
+    response: Response,
     game_id: int, 
     date: Optional[str] = None, 
-    db: Session = Depends(get_postgres_db), 
+    from_date: Optional[Date] = Query(None, alias="from"),
+    to_date: Optional[Date] = Query(None, alias="to"),
+    window_days: Optional[int] = Query(None, ge=1, le=MAX_RANGE_DAYS),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    around_user_id: Optional[int] = None,
+    neighbours: int = Query(5, ge=0, le=MAX_NEIGHBOURS),
+    include_profile: bool = False,
     redis: aioredis.Redis = Depends(get_redis_client)
     ):
     """Route to fetch Game Leaderboard"""
-    game = db.query(GameModel).filter(GameModel.id == game_id).first()
-    if not game:
+    validate_page_mode(cursor, around_user_id)
+    if not await get_registered_game(game_id):
         raise HTTPException(status_code=404, detail="Game not found")
-    if date:
-        game_leaderboard = f"game_{game_id}_leaderboard_{date}"
-    else:
-        game_leaderboard = f"game_{game_id}_leaderboard"
-    response = await game_leaderboard_service(game_leaderboard, redis)
-    return response
+    game_leaderboard = await resolve_leaderboard_key(f"game_{game_id}_leaderboard", date, from_date, to_date, window_days, redis)
+    if uses_snapshot(offset, limit, cursor, around_user_id, from_date, to_date, window_days, include_profile):
+        body, next_cursor = await leaderboard_snapshot_service(game_leaderboard, redis, limit, "No leaderboard data found for this game")
+        return snapshot_response(body, next_cursor)
+    leaderboard = await game_leaderboard_service(game_leaderboard, redis, offset, limit, cursor, around_user_id, neighbours)
+    set_next_cursor(response, leaderboard, limit, around_user_id)
+    if include_profile:
+        leaderboard = await enrich_leaderboard(leaderboard)
+    return leaderboard
@@ -0,0 +1,18 @@
+"""Routing Module for the Scheduler status"""
+
+from fastapi import APIRouter, HTTPException
+from redis.exceptions import RedisError # type: ignore
+
+from ..utils.scheduler import get_scheduler_status
+
+
+router = APIRouter()
+
+
+@router.get("/scheduler/status")
+async def scheduler_status():
+    """Route to fetch the Scheduler leader, jobs and job run metrics"""
+    try:
+        return await get_scheduler_status()
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
@@ -1,11 +1,10 @@
 """Routing module for User Operations"""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models.postgres_models import UserModel
 from ..schemas.postgres_schema import UserCreate, UserUpdate, User
-from ..configs.database.postgres_config import get_postgres_db
+from ..configs.database.postgres_config import get_async_postgres_db
 from ..services.user_service import user_create_service, user_update_service, user_delete_service
 
 
@@ -15,12 +14,9 @@ router = APIRouter()
 @router.post("/users", response_model=User)
 async def create_user(
     user: UserCreate, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
-    """Route to create a new User"""
-    existing_user = db.query(UserModel).filter(UserModel.email == user.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+    """Route to create a new User, a registered email is rejected by its unique index"""
     response = await user_create_service(user, db)
     return response
     
@@ -29,24 +25,18 @@ async def create_user(
 async def update_user(
     user_id: int, 
     user: UserUpdate, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
     """Route to Update an Existing User"""
-    db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    response = await user_update_service(db_user, user, db)
+    response = await user_update_service(user_id, user, db)
     return response
     
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int, 
-    db: Session = Depends(get_postgres_db)
+    db: AsyncSession = Depends(get_async_postgres_db)
     ):
     """Route to Delete a User"""
-    db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    response = await user_delete_service(db_user, db)
+    response = await user_delete_service(user_id, db)
     return response
\ No newline at end of file
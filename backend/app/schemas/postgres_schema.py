@@ -1,7 +1,7 @@
 """Schema Module For Database Models"""
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -52,6 +52,15 @@ class GameSessionResponse(GameSessionCreate):
     start_time: datetime
     end_time: Optional[datetime] = None
 
+class GameSessionEventResponse(BaseModel):
+    event_id: str
+    type: str
+    user_id: int
+    game_id: int
+    score: Optional[int] = None
+    at: datetime
+    status: str
+
 class GameStatusBase(BaseModel):
     game_id: int
 
@@ -63,5 +72,35 @@ class GameStatusResponse(GameStatusBase):
     status: str
 
 class LeaderboardResponse(BaseModel):
+    rank: Optional[int] = None
+    user_id: int
+    score: int
+    username: Optional[str] = None
+
+class UserRankResponse(BaseModel):
+    leaderboard: str
+    rank: Optional[int] = None
+    score: Optional[int] = None
+
+class PercentileResponse(BaseModel):
+    leaderboard: str
     user_id: int
-    score: int
\ No newline at end of file
+    score: int
+    top_percent: float
+    members: int
+    sketch_built_at: datetime
+
+class BoardRequest(BaseModel):
+    game_id: int
+    date: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, le=200)
+
+class BatchLeaderboardRequest(BaseModel):
+    boards: List[BoardRequest] = Field(..., min_length=1, max_length=50)
+    limit: int = Field(5, ge=1, le=200)
+    include_profile: bool = False
+
+class BoardLeaderboardResponse(BaseModel):
+    game_id: int
+    date: Optional[str] = None
+    leaderboard: List[LeaderboardResponse]
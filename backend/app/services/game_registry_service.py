@@ -0,0 +1,212 @@
+"""Service Module for the Game Registry cache.
+
+Keeps the existing games and the active GameStatusModel row of each game in
+Redis hashes, mirrored in process. The upvote count of each game is kept in
+its own hash, loaded by game_upvote_service on the game's first upvote and
+never mirrored or overwritten by the registry load. create_game_service,
+start_game_service and end_game_service update the hashes and publish the
+game on the registry channel so every instance drops its mirrored entry.
+"""
+
+import asyncio, json, os
+
+from sqlalchemy import select
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import GameModel, GameStatusModel
+from ..utils.cache import LocalCache, register_local_cache
+
+GAME_REGISTRY_KEY = "game_registry"
+ACTIVE_GAME_STATUS_KEY = "game_registry:active_status"
+GAME_UPVOTES_KEY = "game_registry:upvotes"
+GAME_REGISTRY_LOADED_KEY = "game_registry:loaded"
+GAME_REGISTRY_CHANNEL = "game_registry_updates"
+GAME_REGISTRY_MIRROR_TTL_SECONDS = float(os.getenv("GAME_REGISTRY_MIRROR_TTL_SECONDS", 30))
+GAME_REGISTRY_MIRROR_MAX_ENTRIES = 10000
+
+warming_task = None
+
+game_registry_mirror = LocalCache(GAME_REGISTRY_MIRROR_MAX_ENTRIES, GAME_REGISTRY_MIRROR_TTL_SECONDS)
+register_local_cache(GAME_REGISTRY_CHANNEL, game_registry_mirror)
+
+
+def game_entry(game) -> str:
+    return json.dumps({
+        "id": game.id,
+        "title": game.title,
+        "description": game.description,
+        "created_at": game.created_at,
+    }, default=str)
+
+
+def game_status_entry(game_status) -> str:
+    return json.dumps({
+        "id": game_status.id,
+        "game_id": game_status.game_id,
+        "started_at": game_status.started_at,
+        "status": game_status.status,
+    }, default=str)
+
+
+def mirror_board(game_id: int) -> str:
+    return f"game:{game_id}"
+
+
+async def warm_game_registry():
+    """Business Logic to load the registry once, concurrent callers share the same load"""
+    global warming_task
+    if warming_task is None or warming_task.done():
+        warming_task = asyncio.ensure_future(load_game_registry())
+    await asyncio.shield(warming_task)
+
+
+async def load_game_registry():
+    """Business Logic to load every game and active game status from Postgres into Redis"""
+    redis = await get_redis_client()
+    async with AsyncSessionLocal() as db:
+        games = (await db.scalars(select(GameModel))).all()
+        active_statuses = (await db.scalars(
+            select(GameStatusModel).filter(GameStatusModel.status == "STARTED")
+        )).all()
+    async with redis.pipeline(transaction=True) as pipe:
+        # Games are never deleted, only the active statuses can be stale
+        pipe.delete(ACTIVE_GAME_STATUS_KEY)
+        if games:
+            pipe.hset(GAME_REGISTRY_KEY, mapping={game.id: game_entry(game) for game in games})
+        if active_statuses:
+            pipe.hset(ACTIVE_GAME_STATUS_KEY, mapping={
+                game_status.game_id: game_status_entry(game_status) for game_status in active_statuses
+            })
+        pipe.set(GAME_REGISTRY_LOADED_KEY, 1)
+        await pipe.execute()
+    game_registry_mirror.clear()
+    print(f"📒 Game registry loaded with {len(games)} games")
+
+
+async def read_game_registry(game_id: int):
+    """Business Logic to read a game and its active status from the registry hashes, None when the registry is not loaded"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.exists(GAME_REGISTRY_LOADED_KEY)
+        pipe.hget(GAME_REGISTRY_KEY, game_id)
+        pipe.hget(ACTIVE_GAME_STATUS_KEY, game_id)
+        loaded, game, active_status = await pipe.execute()
+    if not loaded:
+        return None
+    return {
+        "game": json.loads(game) if game else None,
+        "active_status": json.loads(active_status) if active_status else None,
+    }
+
+
+async def read_game_from_postgres(game_id: int):
+    """Business Logic to read a game and its active status from Postgres, bypassing the registry"""
+    async with AsyncSessionLocal() as db:
+        game = await db.get(GameModel, game_id)
+        active_status = await db.scalar(
+            select(GameStatusModel)
+            .filter(GameStatusModel.game_id == game_id, GameStatusModel.status == "STARTED")
+            .order_by(GameStatusModel.id.desc())
+            .limit(1)
+        )
+    return {
+        "game": json.loads(game_entry(game)) if game else None,
+        "active_status": json.loads(game_status_entry(active_status)) if active_status else None,
+    }
+
+
+async def lookup_game_registry(game_id: int):
+    """Business Logic to read a game and its active status from the registry hashes.
+
+    When Redis lost the registry it is rebuilt from Postgres and read once more. If it is
+    still missing, the game is read from Postgres directly.
+    """
+    entry = await read_game_registry(game_id)
+    if entry is None:
+        await warm_game_registry()
+        entry = await read_game_registry(game_id)
+    if entry is None:
+        entry = await read_game_from_postgres(game_id)
+    return entry
+
+
+async def get_registered_game(game_id: int):
+    """Business Logic to fetch a game from the registry, None when it does not exist"""
+    entry = await game_registry_mirror.get_or_load(
+        mirror_board(game_id), game_id, lambda: lookup_game_registry(game_id)
+    )
+    return entry["game"]
+
+
+async def get_active_game_status(game_id: int):
+    """Business Logic to fetch the active game status of a game from the registry"""
+    entry = await game_registry_mirror.get_or_load(
+        mirror_board(game_id), game_id, lambda: lookup_game_registry(game_id)
+    )
+    return entry["active_status"]
+
+
+async def read_registered_games(game_ids: list):
+    """Business Logic to read many games from the registry hash with a single HMGET, None when the registry is not loaded"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.exists(GAME_REGISTRY_LOADED_KEY)
+        pipe.hmget(GAME_REGISTRY_KEY, game_ids)
+        loaded, entries = await pipe.execute()
+    if not loaded:
+        return None
+    return {game_id: json.loads(entry) for game_id, entry in zip(game_ids, entries) if entry}
+
+
+async def read_games_from_postgres(game_ids: list) -> dict:
+    """Business Logic to read many games from Postgres, bypassing the registry"""
+    async with AsyncSessionLocal() as db:
+        games = (await db.scalars(select(GameModel).filter(GameModel.id.in_(game_ids)))).all()
+    return {game.id: json.loads(game_entry(game)) for game in games}
+
+
+async def get_registered_games(game_ids: list) -> dict:
+    """Business Logic to fetch many games at once, mirrored games are answered locally
+    and the rest is read from the registry, falling back like lookup_game_registry.
+    Returns the existing games by id."""
+    games = {}
+    for game_id in game_ids:
+        entry = game_registry_mirror.peek(game_id)
+        if entry and entry["game"]:
+            games[game_id] = entry["game"]
+    missing = [game_id for game_id in game_ids if game_id not in games]
+    if not missing:
+        return games
+    found = await read_registered_games(missing)
+    if found is None:
+        await warm_game_registry()
+        found = await read_registered_games(missing)
+    if found is None:
+        found = await read_games_from_postgres(missing)
+    games.update(found)
+    return games
+
+
+async def register_game(game):
+    """Business Logic to add a newly created game to the registry"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(GAME_REGISTRY_KEY, game.id, game_entry(game))
+        pipe.hsetnx(GAME_UPVOTES_KEY, game.id, game.upvotes or 0)
+        pipe.publish(GAME_REGISTRY_CHANNEL, json.dumps([mirror_board(game.id)]))
+        await pipe.execute()
+    game_registry_mirror.invalidate([mirror_board(game.id)])
+
+
+async def register_game_status(game_status):
+    """Business Logic to record a started game as active, or drop it once it has ended"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        if game_status.status == "STARTED":
+            pipe.hset(ACTIVE_GAME_STATUS_KEY, game_status.game_id, game_status_entry(game_status))
+        else:
+            pipe.hdel(ACTIVE_GAME_STATUS_KEY, game_status.game_id)
+        pipe.publish(GAME_REGISTRY_CHANNEL, json.dumps([mirror_board(game_status.game_id)]))
+        await pipe.execute()
+    game_registry_mirror.invalidate([mirror_board(game_status.game_id)])
@@ -2,26 +2,30 @@
 
 from datetime import datetime
 from fastapi import HTTPException
-from sqlalchemy import func
+from sqlalchemy import func, insert, update
 from sqlalchemy.exc import SQLAlchemyError
+from redis.exceptions import RedisError # type: ignore
 
-from ..models.postgres_models import GameModel, GameSessionModel, GameStatusModel
+from ..models.postgres_models import DailyActivityStatsModel, GameDailyStatsModel, GameModel, GameSessionModel, GameStatusModel
 from ..schemas.postgres_schema import GameCreate
+from .game_registry_service import register_game, register_game_status
+from .game_session_active_service import clear_active_sessions
+from .game_upvote_service import count_upvote
 
 
 async def create_game_service(game: GameCreate, db):
-    """Business Logic to Create a New Game"""
+    """Business Logic to Create a New Game, the inserted row is returned by the INSERT"""
     try:
-        db_game = GameModel(
-            title=game.title,
-            description=game.description,
-            created_at=datetime.now()
+        db_game = await db.scalar(
+            insert(GameModel)
+            .values(title=game.title, description=game.description, created_at=datetime.now())
+            .returning(GameModel)
         )
-        db.add(db_game)
-        db.commit()
-        db.refresh(db_game)
+        await db.commit()
+        await register_game(db_game)
         return db_game
     except SQLAlchemyError as e:
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
@@ -29,120 +33,104 @@ async def create_game_service(game: GameCreate, db):
 async def start_game_service(game_id: int, db):
     """Business Logic to Start a Game"""
     try:
-        db_game = GameStatusModel(
-            game_id = game_id
-        )
-        db.add(db_game)
-        db.commit()
-        db.refresh(db_game)
+        db_game = await db.scalar(insert(GameStatusModel).values(game_id=game_id).returning(GameStatusModel))
+        await db.commit()
+        await register_game_status(db_game)
         return db_game
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
-async def end_game_service(db_game, db):
-    """Business Logic to End a Game"""
+async def end_game_service(game_status_id: int, db):
+    """Business Logic to End a Game and drop its active sessions"""
     try:
-        db_game.status = "ENDED"
-        db_game.ended_at = datetime.now()
-        db.commit()
-        db.refresh(db_game)
+        db_game = await db.scalar(
+            update(GameStatusModel)
+            .where(GameStatusModel.id == game_status_id, GameStatusModel.status == "STARTED")
+            .values(status="ENDED", ended_at=datetime.now())
+            .returning(GameStatusModel)
+        )
+        if db_game is None:
+            raise HTTPException(status_code=404, detail="The game has not started yet.")
+        await db.commit()
+        await register_game_status(db_game)
+        await clear_active_sessions(db_game.game_id)
         return db_game
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
-async def upvote_game_service(game, db):
-    """Business Logic to Upvote a Game"""
+async def upvote_game_service(game: dict):
+    """Business Logic to Upvote a Game, counted in Redis and flushed to the games table later"""
     try:
-        game.upvotes += 1
-        db.commit()
-        db.refresh(game)
-        return game
+        return {**game, "upvotes": await count_upvote(game["id"])}
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
     except SQLAlchemyError as e:
-        db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
-async def popularity_index_service(game_id, yesterday_start, yesterday_end, db):
-    """Business Logic to fetch the Popularity Index"""
+def popularity_index_service(yesterday, db, upvote_counts: dict = None):
+    """Business Logic to fetch the Popularity Index of every Game from the daily rollup.
+
+    upvote_counts are the current counts read from Redis by the caller, they include
+    the upvotes not flushed to the games table yet.
+    """
     try:
         # w1 - Number of players who played the Game Yesterday
         # w2 - Number of people playing the game right now
         # w3 - Total number of upvotes received for the game
         # w4 - Maximum session length of the game played (considering only the sessions played yesterday)
         # w5 - Total number of sessions played yesterday
+        yesterday_stats = db.query(
+            GameDailyStatsModel.game_id,
+            GameDailyStatsModel.distinct_players,
+            GameDailyStatsModel.max_session_seconds,
+            GameDailyStatsModel.completed_sessions
+        ).filter(GameDailyStatsModel.stat_date == yesterday).all()
+
+        active_sessions = dict(db.query(GameSessionModel.game_id, func.count())
+        .filter(GameSessionModel.game_status == "STARTED")
+        .group_by(GameSessionModel.game_id).all())
+
+        upvotes = dict(db.query(GameModel.id, GameModel.upvotes).all())
+        upvotes.update({game_id: count for game_id, count in (upvote_counts or {}).items() if game_id in upvotes})
+
+        # Normalizing maxima are shared by every game, so they are computed once per run
+        max_daily_players = db.query(DailyActivityStatsModel.distinct_players).filter(
+            DailyActivityStatsModel.stat_date == yesterday
+        ).scalar() or 1
+
+        max_concurrent_players = sum(active_sessions.values()) or 1
+
+        max_upvotes = max((upvote for upvote in upvotes.values() if upvote is not None), default=0) or 1
 
-        w1 = db.query(GameSessionModel.user_id).filter(
-            GameSessionModel.game_id == game_id, 
-            GameSessionModel.start_time >= yesterday_start,
-            GameSessionModel.start_time < yesterday_end
-        ).distinct().count()
-        
-        w2 = db.query(GameSessionModel).filter(
-            GameSessionModel.game_id == game_id,
-            GameSessionModel.game_status == "STARTED"
-        ).count()
-        
-        w3 = db.query(GameModel).filter(GameModel.id == game_id).first().upvotes
-        
-        w4_query = (db.query(func.max(GameSessionModel.end_time - GameSessionModel.start_time))
-        .filter(
-            GameSessionModel.game_id == game_id,
-            GameSessionModel.start_time >= yesterday_start,  
-            GameSessionModel.end_time < yesterday_end,
-            GameSessionModel.end_time.isnot(None)
-        ).scalar())
-        w4 = w4_query.total_seconds() if w4_query else 0
+        max_session_length = max((length for _, _, length, _ in yesterday_stats), default=0) or 1
 
-        w5 = (db.query(GameSessionModel.end_time - GameSessionModel.start_time)
-        .filter(
-            GameSessionModel.game_id == game_id,
-            GameSessionModel.start_time >= yesterday_start,
-            GameSessionModel.end_time < yesterday_end,
-            GameSessionModel.end_time.isnot(None)
-        ).count())
-        
-        max_daily_players = db.query(GameSessionModel.user_id).filter( 
-            GameSessionModel.start_time >= yesterday_start,
-            GameSessionModel.start_time < yesterday_end
-        ).distinct().count() or 1
-        
-        max_concurrent_players = db.query(GameSessionModel).filter(
-            GameSessionModel.game_status == "STARTED"
-        ).distinct().count() or 1
-        
-        max_upvotes = db.query(func.max(GameModel.upvotes)).scalar() or 1
-        
-        max_session_length_hours = (db.query(func.max(GameSessionModel.end_time - GameSessionModel.start_time))
-        .filter(
-            GameSessionModel.start_time >= yesterday_start,  
-            GameSessionModel.end_time < yesterday_end,
-            GameSessionModel.end_time.isnot(None)
-        ).scalar())
-        max_session_length = max_session_length_hours.total_seconds() if max_session_length_hours else 1
+        max_daily_sessions = sum(sessions for _, _, _, sessions in yesterday_stats) or 1
 
-        max_daily_sessions = (db.query(GameSessionModel.end_time - GameSessionModel.start_time)
-        .filter(
-            GameSessionModel.start_time >= yesterday_start,
-            GameSessionModel.end_time < yesterday_end,
-            GameSessionModel.end_time.isnot(None)
-        ).count()) or 1
-        
-        popularity_index =  (0.3 * (w1/max_daily_players) + 
-         0.2 * (w2/max_concurrent_players) + 
-         0.25 * (w3/max_upvotes) + 
-         0.15 * (w4/max_session_length) + 
-         0.1 * (w5/max_daily_sessions))
+        stats_by_game = {game_id: (players, length, sessions) for game_id, players, length, sessions in yesterday_stats}
+        popularity_list = []
+        for game_id, game_upvotes in upvotes.items():
+            w1, w4, w5 = stats_by_game.get(game_id, (0, 0, 0))
+            w2 = active_sessions.get(game_id, 0)
+            w3 = game_upvotes or 0
 
-        return {"game_id": game_id, "popularity_index": round(popularity_index, 2)}
+            popularity_index =  (0.3 * (w1/max_daily_players) + 
+             0.2 * (w2/max_concurrent_players) + 
+             0.25 * (w3/max_upvotes) + 
+             0.15 * (w4/max_session_length) + 
+             0.1 * (w5/max_daily_sessions))
+            popularity_list.append({"game_id": game_id, "popularity_index": round(popularity_index, 2)})
+        return popularity_list
     except SQLAlchemyError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
-    
\ No newline at end of file
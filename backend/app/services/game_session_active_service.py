@@ -0,0 +1,107 @@
+"""Service Module for the active game sessions of the stream ingest.
+
+The users with a started session of each game are kept in the
+`game_session_joins:{game_id}` hash, mapping each user to the event id of their
+join, which join and exit check in stream mode. An exit event carries the
+event id of the join it ends, so it never closes another session of the user.
+The hash is loaded from the STARTED sessions in Postgres on first use, and
+again once Redis lost it together with its `:loaded` marker. Ending a game
+drops it.
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import GameSessionModel
+from ..utils.sharding import related_key
+
+# Record a join (HSETNX, 0 when the user already has an active session) or take the
+# user's join event id for an exit (false when the user has none), -1 while not loaded
+MARK_ACTIVE_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  return -1
+end
+if ARGV[1] == 'join' then
+  return redis.call('HSETNX', KEYS[1], ARGV[2], ARGV[3])
+end
+local join_event_id = redis.call('HGET', KEYS[1], ARGV[2])
+if join_event_id then
+  redis.call('HDEL', KEYS[1], ARGV[2])
+end
+return join_event_id
+"""
+
+# Drop a user's active session if it still is the given join
+DROP_ACTIVE_SESSION_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+  return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# Load a game's active sessions unless another instance loaded them first
+LOAD_ACTIVE_SESSIONS_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+  return 0
+end
+for i = 1, #ARGV, 1000 do
+  redis.call('HSET', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('SET', KEYS[2], 1)
+return 1
+"""
+
+
+def active_sessions_key(game_id: int) -> str:
+    """Join event id of every user with a started session of the game, the stream mode checks joins and exits against it"""
+    return f"game_session_joins:{game_id}"
+
+
+def active_sessions_loaded_key(game_id: int) -> str:
+    """Set once the game's active sessions were loaded from Postgres, in the slot of the hash"""
+    return related_key(active_sessions_key(game_id), "loaded")
+
+
+async def load_active_sessions(game_id: int):
+    """Business Logic to load the users with a STARTED session of the game from Postgres.
+
+    Sessions joined in direct mode have no event id, their exit closes the user's started session.
+    """
+    redis = await get_redis_client()
+    async with AsyncSessionLocal() as db:
+        sessions = (await db.execute(
+            select(GameSessionModel.user_id, GameSessionModel.event_id).filter(
+                GameSessionModel.game_id == game_id,
+                GameSessionModel.game_status == "STARTED",
+                GameSessionModel.user_id.is_not(None)
+            )
+        )).all()
+    fields = [value for user_id, event_id in sessions for value in (user_id, event_id or "")]
+    await redis.eval(LOAD_ACTIVE_SESSIONS_SCRIPT, 2, active_sessions_key(game_id), active_sessions_loaded_key(game_id), *fields)
+
+
+async def mark_active_session(command: str, game_id: int, user_id: int, event_id: str = ""):
+    """Business Logic to record a user's join or take it for an exit, loading the game's active sessions first if needed.
+
+    A join returns 1, or 0 when the user already has an active session. An exit returns the
+    event id of the user's join, "" for a session without one, None when the user has none.
+    """
+    redis = await get_redis_client()
+    keys = [active_sessions_key(game_id), active_sessions_loaded_key(game_id)]
+    for _ in range(2):
+        result = await redis.eval(MARK_ACTIVE_SESSION_SCRIPT, 2, *keys, command, user_id, event_id)
+        if result != -1:
+            return result
+        await load_active_sessions(game_id)
+    raise HTTPException(status_code=503, detail="Active game sessions are being loaded, retry later")
+
+
+async def clear_active_sessions(game_id: int):
+    """Business Logic to drop the active sessions of an ended game"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(active_sessions_key(game_id))
+        pipe.delete(active_sessions_loaded_key(game_id))
+        await pipe.execute()
@@ -0,0 +1,473 @@
+"""Service Module for the stream based Game Session ingest.
+
+With GAME_SESSION_INGEST_MODE=stream, join and exit only validate against
+Redis, see game_session_active_service, and append an event to the
+`game_session_events` stream. A consumer group
+worker on every instance reads the events in batches, writes them to Postgres
+in one transaction per batch and then applies the Leaderboard updates.
+
+Joins are written exactly once, they are inserted with ON CONFLICT DO NOTHING on
+their event_id. Their scores are applied at least once: the events are only
+acknowledged after the Leaderboard updates succeeded, so a failing update is
+retried, and entries already acknowledged are skipped. The stream and the boards
+are in different Redis cluster slots, so the updates and the XACK cannot be one
+script, an update that failed half way or a consumer dying before its XACK can
+count a score twice until the next rebuild.
+
+Events are decoded and validated before anything is written, an invalid event
+is moved to the `game_session_events:dead` stream and acknowledged. A batch
+whose Postgres write fails on a data error (e.g. a join of a user deleted
+before ingest) is split until the failing event is isolated and dead-lettered
+the same way, the rest of the batch is written. Errors once the batch is
+committed are never blamed on an event, they leave the entries pending for a
+retry. Entries claimed from a dead consumer more than
+GAME_SESSION_INGEST_MAX_DELIVERIES times are dead-lettered too.
+
+Events are not partitioned, the exit of a session can be written before its
+join. An exit carries the event id of its join and closes only that session, an
+event that arrives before the one it depends on stays pending and is retried
+once it is claimed again, see write_game_session_events.
+"""
+
+import asyncio, json, os, random, time, uuid
+
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from redis.exceptions import ResponseError # type: ignore
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import GameSessionModel, GameStatusModel
+from .game_session_active_service import DROP_ACTIVE_SESSION_SCRIPT, active_sessions_key, mark_active_session
+from .game_session_service import ACTIVE_SESSION_EXISTS
+from ..utils.cache import LEADERBOARD_INVALIDATION_CHANNEL, get_rebuild_cutoff, leaderboard_rebuild_id
+from ..utils.scheduler import INSTANCE_ID
+from ..utils.utils import ADD_GAME_SCORE_SCRIPT, get_game_leaderboard_keys, queue_game_score
+
+GAME_SESSION_INGEST_MODE = os.getenv("GAME_SESSION_INGEST_MODE", "direct")
+GAME_SESSION_INGEST_BATCH_SIZE = int(os.getenv("GAME_SESSION_INGEST_BATCH_SIZE", 500))
+GAME_SESSION_STREAM_MAXLEN = int(os.getenv("GAME_SESSION_STREAM_MAXLEN", 1000000))
+GAME_SESSION_INGEST_BLOCK_MS = 1000
+GAME_SESSION_INGEST_CLAIM_IDLE_MS = 60000
+GAME_SESSION_INGEST_MAX_DELIVERIES = int(os.getenv("GAME_SESSION_INGEST_MAX_DELIVERIES", 5))
+GAME_SESSION_CONSUMER_IDLE_MS = 10 * GAME_SESSION_INGEST_CLAIM_IDLE_MS
+GAME_SESSION_CONSUMER_PRUNE_SECONDS = 60
+RETRY_DELAY_SECONDS = 1
+
+GAME_SESSION_STREAM = "game_session_events"
+GAME_SESSION_GROUP = "game_session_writers"
+GAME_SESSION_DEAD_LETTER_STREAM = "game_session_events:dead"
+GAME_SESSION_INGEST_METRICS_KEY = "game_session_ingest:metrics"
+
+INSERT_BY_DIALECT = {"postgresql": postgres_insert, "sqlite": sqlite_insert}
+
+# Delete a consumer of the group, only when it has no pending entries and was idle long enough.
+# Deleting a consumer drops its pending entries, so the check and the delete are one script.
+DELETE_IDLE_CONSUMER_SCRIPT = """
+for _, consumer in ipairs(redis.call('XINFO', 'CONSUMERS', KEYS[1], ARGV[1])) do
+  local info = {}
+  for i = 1, #consumer, 2 do
+    info[consumer[i]] = consumer[i + 1]
+  end
+  if info['name'] == ARGV[2] then
+    if info['pending'] ~= 0 or info['idle'] < tonumber(ARGV[3]) then
+      return 0
+    end
+    redis.call('XGROUP', 'DELCONSUMER', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+  end
+end
+return 0
+"""
+
+# Errors of the Postgres write caused by the content of an event, retrying the same event fails again
+POISON_WRITE_ERRORS = (IntegrityError, DataError)
+
+
+class PoisonEventError(Exception):
+    """An event that can never be written, raised before anything of its batch is committed"""
+
+
+def decode_game_session_event(fields: dict) -> dict:
+    """Business Logic to decode and validate a stream entry, raises PoisonEventError for an invalid event"""
+    try:
+        event = json.loads(fields["event"])
+        if event["type"] not in ("join", "exit") or not isinstance(event["event_id"], str):
+            raise ValueError(f"Unknown event {event['type']!r}")
+        required = ["user_id", "game_id"] + (["game_status_id", "score"] if event["type"] == "join" else [])
+        for field in required:
+            if not isinstance(event[field], int) or isinstance(event[field], bool):
+                raise ValueError(f"{field} must be an integer")
+        if event["type"] == "exit" and not isinstance(event.setdefault("join_event_id", ""), str):
+            raise ValueError("join_event_id must be a string")
+        datetime.fromisoformat(event["at"])
+        return event
+    except (ValueError, KeyError, TypeError) as e:
+        raise PoisonEventError(f"{type(e).__name__}: {e}") from e
+
+
+async def publish_game_session_event(event: dict) -> dict:
+    """Business Logic to append a join or exit event to the ingest stream"""
+    redis = await get_redis_client()
+    event = {"event_id": uuid.uuid4().hex, **event, "at": datetime.now().isoformat()}
+    await redis.xadd(GAME_SESSION_STREAM, {"event": json.dumps(event)}, maxlen=GAME_SESSION_STREAM_MAXLEN, approximate=True)
+    return {**event, "status": "queued"}
+
+
+async def queue_join_event(user_id: int, game_id: int, game_status_id: int) -> dict:
+    """Business Logic to mark the user active in the game and queue the join, unmarked again if the queueing fails"""
+    event_id = uuid.uuid4().hex
+    if not await mark_active_session("join", game_id, user_id, event_id):
+        raise HTTPException(status_code=404, detail=ACTIVE_SESSION_EXISTS)
+    try:
+        return await publish_game_session_event({
+            "type": "join",
+            "event_id": event_id,
+            "user_id": user_id,
+            "game_id": game_id,
+            "game_status_id": game_status_id,
+            "score": random.choice(range(0, 101, 5)),
+        })
+    except Exception:
+        redis = await get_redis_client()
+        await redis.hdel(active_sessions_key(game_id), user_id)
+        raise
+
+
+async def queue_exit_event(user_id: int, game_id: int) -> dict:
+    """Business Logic to take the user's active join and queue its exit, marked again if the queueing fails"""
+    join_event_id = await mark_active_session("exit", game_id, user_id)
+    if join_event_id is None:
+        raise HTTPException(status_code=404, detail="Game session not found")
+    try:
+        return await publish_game_session_event({"type": "exit", "user_id": user_id, "game_id": game_id, "join_event_id": join_event_id})
+    except Exception:
+        redis = await get_redis_client()
+        await redis.hset(active_sessions_key(game_id), user_id, join_event_id)
+        raise
+
+
+async def write_game_session_events(events: list) -> tuple:
+    """Business Logic to write a batch of events to Postgres in one transaction.
+
+    Consecutive events of the same type are written together, in stream order. An exit
+    closes the session of the join it carries, so it never closes a session joined after
+    it. Events of one user and game can still reach different consumers out of order, an
+    event that arrived early is deferred: a join hitting the user's active session, whose
+    exit is not written yet, and an exit whose join is not written yet. Returns the session
+    id of every written join by event id and the event ids of the deferred events.
+    """
+    session_ids = {}
+    deferred = set()
+    async with AsyncSessionLocal() as db:
+        insert = INSERT_BY_DIALECT[db.get_bind().dialect.name]
+        runs = []
+        for event in events:
+            if runs and runs[-1][0] == event["type"]:
+                runs[-1][1].append(event)
+            else:
+                runs.append((event["type"], [event]))
+        for event_type, run in runs:
+            if event_type == "join":
+                inserted = dict((await db.execute(
+                    insert(GameSessionModel)
+                    .values([{
+                        "event_id": event["event_id"],
+                        "user_id": event["user_id"],
+                        "game_id": event["game_id"],
+                        "score": event["score"],
+                        "start_time": datetime.fromisoformat(event["at"]),
+                        "game_status": "STARTED",
+                    } for event in run])
+                    .on_conflict_do_nothing()
+                    .returning(GameSessionModel.event_id, GameSessionModel.id)
+                )).all())
+                session_ids.update(inserted)
+                # A join that was not inserted is either a redelivery or hit the active session index
+                skipped = [event["event_id"] for event in run if event["event_id"] not in inserted]
+                if skipped:
+                    session_ids.update((await db.execute(
+                        select(GameSessionModel.event_id, GameSessionModel.id).filter(GameSessionModel.event_id.in_(skipped))
+                    )).all())
+                    deferred.update(event_id for event_id in skipped if event_id not in session_ids)
+                joined = {}
+                for event in run:
+                    if event["event_id"] in inserted:
+                        joined[event["game_status_id"]] = joined.get(event["game_status_id"], 0) + 1
+                for game_status_id, count in joined.items():
+                    await db.execute(
+                        update(GameStatusModel)
+                        .where(GameStatusModel.id == game_status_id)
+                        .values(number_of_users_joined=GameStatusModel.number_of_users_joined + count)
+                    )
+            else:
+                for event in run:
+                    ended_at = datetime.fromisoformat(event["at"])
+                    if event["join_event_id"]:
+                        session = GameSessionModel.event_id == event["join_event_id"]
+                    else:
+                        # Sessions joined in direct mode have no event id, close the user's started one
+                        session = GameSessionModel.start_time <= ended_at
+                    closed = await db.execute(
+                        update(GameSessionModel)
+                        .where(
+                            GameSessionModel.game_id == event["game_id"],
+                            GameSessionModel.user_id == event["user_id"],
+                            GameSessionModel.game_status == "STARTED",
+                            session
+                        )
+                        .values(end_time=ended_at, game_status="COMPLETED")
+                    )
+                    # A redelivered exit finds its session already closed
+                    if not closed.rowcount and event["join_event_id"] and not await db.scalar(
+                        select(GameSessionModel.id).filter(GameSessionModel.event_id == event["join_event_id"])
+                    ):
+                        deferred.add(event["event_id"])
+        await db.commit()
+    return session_ids, deferred
+
+
+async def apply_game_session_events(entries: list, session_ids: dict, deferred: set = frozenset()):
+    """Business Logic to update the Leaderboards with the written joins, then acknowledge the events.
+
+    The events are only acknowledged once every score update succeeded, a failing update
+    leaves them pending for a retry. Entries another consumer already acknowledged are
+    dropped by claiming the batch first, so a late redelivery is not applied twice.
+    Deferred events stay pending, they are claimed again after GAME_SESSION_INGEST_CLAIM_IDLE_MS.
+    """
+    redis = await get_redis_client()
+    entry_ids = [entry_id for entry_id, event in entries if event["event_id"] not in deferred]
+    if not entry_ids:
+        return
+    pending = set(await redis.xclaim(GAME_SESSION_STREAM, GAME_SESSION_GROUP, INSTANCE_ID, 0, entry_ids, justid=True))
+    joins = [
+        event for entry_id, event in entries
+        if entry_id in pending and event["type"] == "join" and event["event_id"] in session_ids
+    ]
+    if joins:
+        add_score = redis.register_script(ADD_GAME_SCORE_SCRIPT)
+        cutoff = await get_rebuild_cutoff(redis)
+        boards = set()
+        async with redis.pipeline(transaction=False) as pipe:
+            for event in joins:
+                event_boards = get_game_leaderboard_keys(event["game_id"], event["at"][:10])
+                boards.update(event_boards)
+                rebuild_id = leaderboard_rebuild_id(cutoff, session_ids[event["event_id"]])
+                await queue_game_score(pipe, add_score, event_boards, event["user_id"], event["score"], rebuild_id)
+            pipe.publish(LEADERBOARD_INVALIDATION_CHANNEL, json.dumps(sorted(boards)))
+            await pipe.execute()
+    await redis.xack(GAME_SESSION_STREAM, GAME_SESSION_GROUP, *entry_ids)
+
+
+async def process_game_session_entries(entries: list):
+    """Business Logic to write, apply and acknowledge a batch of decoded stream entries.
+
+    Raises PoisonEventError when the write fails on the content of an event, nothing of
+    the batch is committed then. Errors after the commit are raised as they are.
+    """
+    redis = await get_redis_client()
+    started = time.monotonic()
+    events = [(entry_id, decode_game_session_event(fields)) for entry_id, fields in entries]
+    try:
+        session_ids, deferred = await write_game_session_events([event for _, event in events])
+    except POISON_WRITE_ERRORS as e:
+        raise PoisonEventError(f"{type(e).__name__}: {e}") from e
+    await apply_game_session_events(events, session_ids, deferred)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hincrby(GAME_SESSION_INGEST_METRICS_KEY, "batches_total", 1)
+        pipe.hincrby(GAME_SESSION_INGEST_METRICS_KEY, "events_total", len(events))
+        pipe.hincrby(GAME_SESSION_INGEST_METRICS_KEY, "deferred_total", len(deferred))
+        pipe.hset(GAME_SESSION_INGEST_METRICS_KEY, mapping={
+            "last_batch_size": len(events),
+            "last_batch_seconds": round(time.monotonic() - started, 3),
+            "last_batch_at": datetime.now().isoformat(),
+        })
+        await pipe.execute()
+
+
+async def dead_letter_game_session_entries(entries: list, reason: str):
+    """Business Logic to move entries that cannot be written to the dead letter stream and acknowledge them.
+
+    A dead-lettered join also clears the user's active marker, so the user can join again.
+    The stream, the dead letters and the markers are in different cluster slots, so this is
+    a plain pipeline with the XACK last: a failure half way leaves the entries pending.
+    """
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        for entry_id, fields in entries:
+            pipe.xadd(GAME_SESSION_DEAD_LETTER_STREAM, {**fields, "entry_id": entry_id, "reason": reason[:1000]})
+            try:
+                event = decode_game_session_event(fields)
+                if event["type"] == "join":
+                    pipe.eval(DROP_ACTIVE_SESSION_SCRIPT, 1, active_sessions_key(event["game_id"]), event["user_id"], event["event_id"])
+            except PoisonEventError:
+                pass
+        pipe.hincrby(GAME_SESSION_INGEST_METRICS_KEY, "dead_lettered_total", len(entries))
+        pipe.xack(GAME_SESSION_STREAM, GAME_SESSION_GROUP, *(entry_id for entry_id, _ in entries))
+        await pipe.execute()
+    print(f"☠️ Dead-lettered {len(entries)} game session events: {reason.splitlines()[0]}")
+
+
+async def process_or_isolate_game_session_entries(entries: list):
+    """Business Logic to process a batch, splitting it on a poison event until that event is isolated.
+
+    Entries that do not decode are dead-lettered first. The halves are processed in stream
+    order. Other errors, e.g. Postgres or Redis being unavailable or failing after the
+    commit, are raised and leave the entries pending for a retry.
+    """
+    valid, invalid = [], []
+    for entry_id, fields in entries:
+        try:
+            decode_game_session_event(fields)
+            valid.append((entry_id, fields))
+        except PoisonEventError as e:
+            invalid.append(((entry_id, fields), str(e)))
+    for entry, reason in invalid:
+        await dead_letter_game_session_entries([entry], reason)
+    if valid:
+        await isolate_poison_game_session_entries(valid)
+
+
+async def isolate_poison_game_session_entries(entries: list):
+    """Business Logic to process decoded entries, bisecting the batch when its write fails on an event"""
+    try:
+        await process_game_session_entries(entries)
+    except PoisonEventError as e:
+        if len(entries) == 1:
+            await dead_letter_game_session_entries(entries, str(e))
+            return
+        middle = len(entries) // 2
+        await isolate_poison_game_session_entries(entries[:middle])
+        await isolate_poison_game_session_entries(entries[middle:])
+
+
+async def claim_game_session_entries(cursor: str) -> str:
+    """Business Logic to claim and process the entries left pending by a dead consumer.
+
+    Entries already delivered more than GAME_SESSION_INGEST_MAX_DELIVERIES times are dead-lettered.
+    Returns the cursor of the next claim.
+    """
+    redis = await get_redis_client()
+    cursor, claimed, *_ = await redis.xautoclaim(
+        GAME_SESSION_STREAM, GAME_SESSION_GROUP, INSTANCE_ID,
+        GAME_SESSION_INGEST_CLAIM_IDLE_MS, start_id=cursor, count=GAME_SESSION_INGEST_BATCH_SIZE
+    )
+    claimed = [(entry_id, fields) for entry_id, fields in claimed if fields]
+    if not claimed:
+        return cursor
+    async with redis.pipeline(transaction=False) as pipe:
+        for entry_id, _ in claimed:
+            pipe.xpending_range(GAME_SESSION_STREAM, GAME_SESSION_GROUP, min=entry_id, max=entry_id, count=1)
+        deliveries = {
+            pending[0]["message_id"]: pending[0]["times_delivered"]
+            for pending in await pipe.execute() if pending
+        }
+    exhausted = [entry for entry in claimed if deliveries.get(entry[0], 0) > GAME_SESSION_INGEST_MAX_DELIVERIES]
+    if exhausted:
+        await dead_letter_game_session_entries(exhausted, f"Delivered more than {GAME_SESSION_INGEST_MAX_DELIVERIES} times")
+    retried = [entry for entry in claimed if deliveries.get(entry[0], 0) <= GAME_SESSION_INGEST_MAX_DELIVERIES]
+    if retried:
+        await process_or_isolate_game_session_entries(retried)
+    return cursor
+
+
+async def delete_game_session_consumer(consumer: str, min_idle_ms: int) -> bool:
+    """Business Logic to remove a consumer from the group unless it still has pending entries"""
+    redis = await get_redis_client()
+    return bool(await redis.eval(
+        DELETE_IDLE_CONSUMER_SCRIPT, 1, GAME_SESSION_STREAM, GAME_SESSION_GROUP, consumer, min_idle_ms
+    ))
+
+
+async def prune_game_session_consumers() -> int:
+    """Business Logic to remove the consumers of stopped instances from the group.
+
+    Consumers are named after their instance, every restart joins with a new name. One
+    idle for GAME_SESSION_CONSUMER_IDLE_MS with nothing pending is removed, its pending
+    entries are claimed by the live consumers first. Returns the number of removed consumers.
+    """
+    redis = await get_redis_client()
+    removed = 0
+    for consumer in await redis.xinfo_consumers(GAME_SESSION_STREAM, GAME_SESSION_GROUP):
+        if consumer["name"] == INSTANCE_ID or consumer["pending"] or consumer["idle"] < GAME_SESSION_CONSUMER_IDLE_MS:
+            continue
+        removed += await delete_game_session_consumer(consumer["name"], GAME_SESSION_CONSUMER_IDLE_MS)
+    if removed:
+        print(f"🧹 Removed {removed} idle game session consumers")
+    return removed
+
+
+async def run_game_session_ingest():
+    """Background task consuming the ingest stream in batches.
+
+    Entries left pending by a consumer that died are claimed after GAME_SESSION_INGEST_CLAIM_IDLE_MS.
+    A failing claim is logged and does not hold back the new entries. On shutdown the
+    consumer leaves the group if nothing is pending on it, the consumers of instances that
+    died are pruned every GAME_SESSION_CONSUMER_PRUNE_SECONDS.
+    """
+    redis = await get_redis_client()
+    claim_cursor = "0-0"
+    pruned_at = time.monotonic()
+    while True:
+        try:
+            try:
+                await redis.xgroup_create(GAME_SESSION_STREAM, GAME_SESSION_GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            while True:
+                try:
+                    claim_cursor = await claim_game_session_entries(claim_cursor)
+                except Exception as e:
+                    print(f"⚠️ Game session claim error: {str(e)}")
+                    claim_cursor = "0-0"
+                if time.monotonic() - pruned_at >= GAME_SESSION_CONSUMER_PRUNE_SECONDS:
+                    pruned_at = time.monotonic()
+                    try:
+                        await prune_game_session_consumers()
+                    except Exception as e:
+                        print(f"⚠️ Game session consumer prune error: {str(e)}")
+                response = await redis.xreadgroup(
+                    GAME_SESSION_GROUP, INSTANCE_ID, {GAME_SESSION_STREAM: ">"},
+                    count=GAME_SESSION_INGEST_BATCH_SIZE, block=GAME_SESSION_INGEST_BLOCK_MS
+                )
+                for _, entries in response:
+                    if entries:
+                        await process_or_isolate_game_session_entries(entries)
+        except asyncio.CancelledError:
+            try:
+                await delete_game_session_consumer(INSTANCE_ID, 0)
+            except Exception as e:
+                print(f"⚠️ Could not leave the game session group: {str(e)}")
+            raise
+        except Exception as e:
+            print(f"⚠️ Game session ingest error: {str(e)}")
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+
+async def get_game_session_ingest_status():
+    """Business Logic to report the ingest mode, consumer lag and batch metrics"""
+    redis = await get_redis_client()
+    status = {"mode": GAME_SESSION_INGEST_MODE}
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xlen(GAME_SESSION_STREAM)
+        pipe.xlen(GAME_SESSION_DEAD_LETTER_STREAM)
+        pipe.hgetall(GAME_SESSION_INGEST_METRICS_KEY)
+        status["stream_length"], status["dead_letter_length"], status["metrics"] = await pipe.execute()
+    try:
+        groups = await redis.xinfo_groups(GAME_SESSION_STREAM)
+    except ResponseError:
+        groups = []
+    for group in groups:
+        if group["name"] == GAME_SESSION_GROUP:
+            status.update({
+                "consumers": group["consumers"],
+                "pending": group["pending"],
+                "lag": group.get("lag"),
+                "last_delivered_id": group["last-delivered-id"],
+            })
+    return status
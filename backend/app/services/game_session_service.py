@@ -4,58 +4,74 @@ import random
 from datetime import datetime
 
 from fastapi import HTTPException
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from ..utils.utils import add_game_score_to_redis
-from ..models.postgres_models import GameSessionModel
+from ..utils.utils import add_game_score_to_redis, get_game_leaderboard_keys
+from ..models.postgres_models import GameSessionModel, GameStatusModel
 
+ACTIVE_SESSION_INDEX = "uq_game_session_active_game_id_user_id"
+USER_FOREIGN_KEY = "game_session_user_id_fkey"
+ACTIVE_SESSION_EXISTS = "An active game session exists. Please go back to the game or end the previous game session to start a new one."
 
-async def create_game_session_service(user_id: int, game_id: int, game_activity_status, db):
+
+async def create_game_session_service(user_id: int, game_id: int, game_status_id: int, db):
     """Business Logic to Create a Game Session to upate the Game start, end time as well as number of users joined."""
     try:
         game_score = random.choice(range(0, 101, 5))
-        
-        db_game_Session = GameSessionModel(
-            user_id=user_id,
-            game_id=game_id,
-            score=game_score,
-            start_time=datetime.now()
+        db_game_Session = await db.scalar(
+            insert(GameSessionModel)
+            .values(user_id=user_id, game_id=game_id, score=game_score, start_time=datetime.now())
+            .returning(GameSessionModel)
+        )
+        # Incremented in the join's transaction, so a committed join is always counted
+        await db.execute(
+            update(GameStatusModel)
+            .where(GameStatusModel.id == game_status_id)
+            .values(number_of_users_joined=GameStatusModel.number_of_users_joined + 1)
         )
-        game_activity_status.number_of_users_joined += 1
-        db.add(db_game_Session)
-        db.commit()
-        db.refresh(db_game_Session)
+        await db.commit()
 
         try:
             today_date = datetime.today().date()
-            global_leaderboard = "global_leaderboard"
-            game_leaderboard = f"game_{game_id}_leaderboard"
-            global_leaderboard_date = f"global_leaderboard_{today_date}"
-            game_leaderboard_date = f"game_{game_id}_leaderboard_{today_date}"
-            await add_game_score_to_redis(global_leaderboard, user_id, game_score)
-            await add_game_score_to_redis(game_leaderboard, user_id, game_score)
-            await add_game_score_to_redis(global_leaderboard_date, user_id, game_score)
-            await add_game_score_to_redis(game_leaderboard_date, user_id, game_score)
+            await add_game_score_to_redis(get_game_leaderboard_keys(game_id, today_date), user_id, game_score, db_game_Session.id)
         except Exception as redis_error:
             raise HTTPException(status_code=500, detail=f"Redis error: {redis_error}")
         return db_game_Session
+    except IntegrityError as e:
+        await db.rollback()
+        if ACTIVE_SESSION_INDEX in str(e.orig):
+            raise HTTPException(status_code=404, detail=ACTIVE_SESSION_EXISTS)
+        if USER_FOREIGN_KEY in str(e.orig):
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
     
-async def update_game_session_service(game_session, db):
-    """Business Logic to Update the Game session with the End time and status"""
+async def update_game_session_service(game_id: int, user_id: int, db):
+    """Business Logic to End the user's active Game session with the End time and status"""
     try:
-        game_session.end_time = datetime.now()
-        game_session.game_status = "COMPLETED"
-        db.commit()
-        db.refresh(game_session)
+        game_session = await db.scalar(
+            update(GameSessionModel)
+            .where(
+                GameSessionModel.game_id == game_id,
+                GameSessionModel.user_id == user_id,
+                GameSessionModel.game_status == "STARTED"
+            )
+            .values(end_time=datetime.now(), game_status="COMPLETED")
+            .returning(GameSessionModel)
+        )
+        if game_session is None:
+            raise HTTPException(status_code=404, detail="Game session not found")
+        await db.commit()
         return game_session
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""Service Module for the Daily Game Activity Rollup"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Date, and_, cast, distinct, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models.postgres_models import DailyActivityStatsModel, GameDailyStatsModel, GameDailyStatsProgressModel, GameSessionModel
+
+# Sessions and exits are stamped in the app before they commit, so a closed day is
+# refreshed once more after this window to pick up the rows that committed late.
+ROLLUP_OVERLAP = timedelta(minutes=5)
+# Advisory lock serializing the rollup job and the backfill script on Postgres
+GAME_DAILY_STATS_LOCK_ID = 4004
+
+
+def lock_game_daily_stats(db):
+    """Business Logic to take the rollup's advisory lock, held until the transaction ends"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(GAME_DAILY_STATS_LOCK_ID)))
+
+
+def refresh_game_daily_stats(stat_dates, db):
+    """Business Logic to recompute the rollup rows of the given days from game_session.
+
+    The rows are deleted and inserted again under an advisory lock, so the rollup job
+    and the backfill script never refresh the same day concurrently.
+    """
+    try:
+        lock_game_daily_stats(db)
+        refreshed_at = datetime.now()
+        for stat_date in stat_dates:
+            day_start = datetime.combine(stat_date, datetime.min.time())
+            day_end = day_start + timedelta(days=1)
+            completed = and_(
+                GameSessionModel.end_time < day_end,
+                GameSessionModel.end_time.isnot(None)
+            )
+
+            game_stats = (db.query(
+                GameSessionModel.game_id,
+                func.count(distinct(GameSessionModel.user_id)),
+                func.max(GameSessionModel.end_time - GameSessionModel.start_time).filter(completed),
+                func.count().filter(completed)
+            )
+            .filter(
+                GameSessionModel.start_time >= day_start,
+                GameSessionModel.start_time < day_end,
+                GameSessionModel.game_id.isnot(None)
+            )
+            .group_by(GameSessionModel.game_id).all())
+
+            distinct_players = db.query(func.count(distinct(GameSessionModel.user_id))).filter(
+                GameSessionModel.start_time >= day_start,
+                GameSessionModel.start_time < day_end
+            ).scalar()
+
+            db.query(GameDailyStatsModel).filter(GameDailyStatsModel.stat_date == stat_date).delete()
+            db.query(DailyActivityStatsModel).filter(DailyActivityStatsModel.stat_date == stat_date).delete()
+            db.add_all([
+                GameDailyStatsModel(
+                    game_id=game_id,
+                    stat_date=stat_date,
+                    distinct_players=players,
+                    completed_sessions=sessions,
+                    max_session_seconds=length.total_seconds() if length else 0,
+                    refreshed_at=refreshed_at
+                )
+                for game_id, players, length, sessions in game_stats
+            ])
+            db.add(DailyActivityStatsModel(
+                stat_date=stat_date,
+                distinct_players=distinct_players,
+                refreshed_at=refreshed_at
+            ))
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+
+
+def aggregate_game_daily_stats(db, now: datetime = None):
+    """Business Logic to refresh the rollup of the closed days touched since the last run.
+
+    Today is never rolled up, the Popularity Index reads yesterday and the live sessions.
+    Yesterday is refreshed until it has been refreshed ROLLUP_OVERLAP after midnight. Older
+    days are refreshed when a session of theirs was inserted after the high-water mark, the
+    highest game_session id seen by the last run, found through the primary key. Without a
+    high-water mark every closed day is refreshed. The ids are read under the advisory lock,
+    so a run waiting for another one sees the high-water mark it committed.
+    """
+    now = now or datetime.now()
+    today_start = datetime.combine(now.date(), datetime.min.time())
+    yesterday = now.date() - timedelta(days=1)
+    try:
+        lock_game_daily_stats(db)
+        latest_session_id = db.query(func.max(GameSessionModel.id)).scalar() or 0
+        progress = db.get(GameDailyStatsProgressModel, 1)
+
+        dirty_days = db.query(distinct(cast(GameSessionModel.start_time, Date))).filter(GameSessionModel.start_time < today_start)
+        if progress is not None:
+            dirty_days = dirty_days.filter(GameSessionModel.id > progress.max_session_id, GameSessionModel.id <= latest_session_id)
+        stat_dates = {day for day, in dirty_days.all()}
+        yesterday_refreshed_at = db.query(DailyActivityStatsModel.refreshed_at).filter(
+            DailyActivityStatsModel.stat_date == yesterday
+        ).scalar()
+        if yesterday_refreshed_at is None or yesterday_refreshed_at < today_start + ROLLUP_OVERLAP:
+            stat_dates.add(yesterday)
+
+        # The high-water mark moves on even when no day is refreshed, it commits with the refresh
+        if progress is None:
+            db.add(GameDailyStatsProgressModel(id=1, max_session_id=latest_session_id, updated_at=now))
+        else:
+            progress.max_session_id = latest_session_id
+            progress.updated_at = now
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    stat_dates = sorted(stat_dates)
+    refresh_game_daily_stats(stat_dates, db)
+    return stat_dates
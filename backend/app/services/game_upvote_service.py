@@ -0,0 +1,130 @@
+"""Service Module for the write-behind upvote counter.
+
+An upvote increments the game's count in the registry upvotes hash and its
+pending count in `game_upvotes:pending` in one script, without touching the
+games row. The leader flushes the pending counts into games.upvotes every
+GAME_UPVOTE_FLUSH_SECONDS. The upvote response and the Popularity Index read
+the count from the registry hash, which already includes the pending upvotes.
+
+A flush first renames the pending hash to its own `game_upvotes:flushing:{id}`
+key and only drops that key after the games rows are committed. The flush id
+is recorded in upvote_flushes in the same transaction, so a flush interrupted
+before its commit is retried by the next run and one interrupted after it is
+not added twice.
+"""
+
+import os, uuid
+
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, update
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import GameModel, UpvoteFlushModel
+from .game_registry_service import GAME_UPVOTES_KEY
+
+UPVOTE_COUNTER_KEY = "game_upvotes:pending"
+UPVOTE_FLUSHES_KEY = "game_upvotes:flushes"
+GAME_UPVOTE_FLUSH_SECONDS = int(os.getenv("GAME_UPVOTE_FLUSH_SECONDS", 10))
+UPVOTE_FLUSH_RETENTION = timedelta(days=7)
+
+# Move the pending counts to the flush's own key and record the flush as unfinished
+TAKE_ALL_COUNTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Count an upvote, nil when the game's count is not loaded yet
+UPVOTE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+  return false
+end
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+"""
+
+
+def upvote_flush_key(flush_id: str) -> str:
+    """Counts taken by a flush, dropped once they are committed"""
+    return f"game_upvotes:flushing:{flush_id}"
+
+
+async def load_game_upvotes(game_id: int):
+    """Business Logic to load a game's count from Postgres, adding the upvotes not flushed yet"""
+    redis = await get_redis_client()
+    flush_ids = await redis.smembers(UPVOTE_FLUSHES_KEY)
+    async with AsyncSessionLocal() as db:
+        upvotes = await db.scalar(select(GameModel.upvotes).filter(GameModel.id == game_id))
+        committed = set((await db.scalars(
+            select(UpvoteFlushModel.flush_id).filter(UpvoteFlushModel.flush_id.in_(flush_ids))
+        )).all()) if flush_ids else set()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hget(UPVOTE_COUNTER_KEY, game_id)
+        for flush_id in flush_ids - committed:
+            pipe.hget(upvote_flush_key(flush_id), game_id)
+        pending = sum(int(count or 0) for count in await pipe.execute())
+    await redis.hsetnx(GAME_UPVOTES_KEY, game_id, (upvotes or 0) + pending)
+
+
+async def count_upvote(game_id: int) -> int:
+    """Business Logic to count an upvote, returns the game's new upvote count"""
+    redis = await get_redis_client()
+    upvotes = await redis.eval(UPVOTE_SCRIPT, 2, GAME_UPVOTES_KEY, UPVOTE_COUNTER_KEY, game_id)
+    if upvotes is None:
+        await load_game_upvotes(game_id)
+        upvotes = await redis.eval(UPVOTE_SCRIPT, 2, GAME_UPVOTES_KEY, UPVOTE_COUNTER_KEY, game_id)
+    return upvotes
+
+
+async def get_upvote_counts() -> dict:
+    """Business Logic to read the current upvote count of every game, by game id"""
+    redis = await get_redis_client()
+    return {int(game_id): int(upvotes) for game_id, upvotes in (await redis.hgetall(GAME_UPVOTES_KEY)).items()}
+
+
+async def commit_upvote_flush(flush_id: str) -> int:
+    """Business Logic to add a flush's counts to games.upvotes once, then drop its Redis key.
+
+    Returns the number of upvotes added, 0 when the flush was already committed.
+    """
+    redis = await get_redis_client()
+    counts = await redis.hgetall(upvote_flush_key(flush_id))
+    pending = {int(game_id): int(count) for game_id, count in counts.items() if int(count)}
+    flushed = 0
+    async with AsyncSessionLocal() as db:
+        if await db.get(UpvoteFlushModel, flush_id) is None:
+            for game_id, count in sorted(pending.items()):
+                await db.execute(
+                    update(GameModel)
+                    .where(GameModel.id == game_id)
+                    .values(upvotes=func.coalesce(GameModel.upvotes, 0) + count)
+                )
+            await db.execute(insert(UpvoteFlushModel).values(flush_id=flush_id, flushed_at=datetime.now()))
+            await db.execute(delete(UpvoteFlushModel).filter(UpvoteFlushModel.flushed_at < datetime.now() - UPVOTE_FLUSH_RETENTION))
+            await db.commit()
+            flushed = sum(pending.values())
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(upvote_flush_key(flush_id))
+        pipe.srem(UPVOTE_FLUSHES_KEY, flush_id)
+        await pipe.execute()
+    return flushed
+
+
+async def flush_upvotes_service() -> int:
+    """Business Logic to add the pending upvotes to games.upvotes in one transaction.
+
+    Flushes left unfinished by an earlier run are committed first. A failing flush keeps
+    its counts in Redis for the next run. Returns the number of flushed upvotes.
+    """
+    redis = await get_redis_client()
+    flushed = 0
+    for flush_id in sorted(await redis.smembers(UPVOTE_FLUSHES_KEY)):
+        flushed += await commit_upvote_flush(flush_id)
+    flush_id = uuid.uuid4().hex
+    if await redis.eval(TAKE_ALL_COUNTS_SCRIPT, 3, UPVOTE_COUNTER_KEY, upvote_flush_key(flush_id), UPVOTE_FLUSHES_KEY, flush_id):
+        flushed += await commit_upvote_flush(flush_id)
+    return flushed
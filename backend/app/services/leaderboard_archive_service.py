@@ -0,0 +1,148 @@
+"""Service Module for the Leaderboard archive.
+
+Closed daily boards and, shortly before their end of month expiry, the all-time
+boards and the board of the month's last day are copied into the
+leaderboard_archive table (top LEADERBOARD_ARCHIVE_MAX_RANK entries). The all-time boards are archived under
+`{board}_{YYYY-MM}`, so `?date=YYYY-MM` reads the board of a past month.
+Leaderboard reads of a past date fall back to the archive once Redis no longer
+has the board.
+"""
+
+import os, re
+
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..models.postgres_models import LeaderboardArchiveModel
+from ..utils.cache import leaderboard_boards_key
+from ..utils.sharding import board_shards, read_leaderboard
+
+LEADERBOARD_ARCHIVE_MAX_RANK = int(os.getenv("LEADERBOARD_ARCHIVE_MAX_RANK", 10000))
+LEADERBOARD_ARCHIVE_INTERVAL_MINUTES = int(os.getenv("LEADERBOARD_ARCHIVE_INTERVAL_MINUTES", 60))
+ARCHIVE_BATCH_SIZE = 1000
+
+DAILY_BOARD = re.compile(r"^(global_leaderboard|game_\d+_leaderboard)_(\d{4}-\d{2}-\d{2})$")
+ALL_TIME_BOARD = re.compile(r"^(global_leaderboard|game_\d+_leaderboard)$")
+ARCHIVED_BOARD = re.compile(r"^(global_leaderboard|game_\d+_leaderboard)_(\d{4}-\d{2}(-\d{2})?)$")
+
+
+def is_archived_board(key: str, now: datetime = None) -> bool:
+    """Boards of a past day or a past month can be read back from the archive"""
+    match = ARCHIVED_BOARD.match(key)
+    if not match:
+        return False
+    period = match.group(2)
+    now = now or datetime.now()
+    return period < (now.strftime("%Y-%m-%d") if len(period) == 10 else now.strftime("%Y-%m"))
+
+
+def archive_plan(board: str, ttl_ms: int, now: datetime = None, lead_ms: int = None):
+    """Archive key of a board and whether it is replaced on every run, None when it is not due.
+
+    Closed days are archived once. Every board expires at the end of the month, so the
+    all-time boards and the board of the month's last day, which is never closed before
+    it expires, are archived on the runs within lead_ms of their expiry.
+    """
+    now = now or datetime.now()
+    lead_ms = 2 * LEADERBOARD_ARCHIVE_INTERVAL_MINUTES * 60 * 1000 if lead_ms is None else lead_ms
+    daily = DAILY_BOARD.match(board)
+    if not daily and not ALL_TIME_BOARD.match(board):
+        return None
+    if daily and is_archived_board(board, now):
+        return board, False
+    if 0 <= ttl_ms <= lead_ms:
+        return (board if daily else f"{board}_{now.strftime('%Y-%m')}"), True
+    return None
+
+
+async def find_boards_to_archive(redis, now: datetime = None) -> dict:
+    """Business Logic to map every board due for archiving to its archive key and replace flag.
+
+    The boards are read from the set of boards written this month, every board expires at
+    the end of the month it was written in.
+    """
+    now = now or datetime.now()
+    boards = await redis.smembers(leaderboard_boards_key(now.strftime("%Y-%m")))
+    due = {}
+    for board in boards:
+        if not (DAILY_BOARD.match(board) or ALL_TIME_BOARD.match(board)):
+            continue
+        async with redis.pipeline(transaction=False) as pipe:
+            for shard in board_shards(board):
+                pipe.pttl(shard)
+            ttl_ms = max(await pipe.execute())
+        plan = archive_plan(board, ttl_ms, now)
+        if plan:
+            due[board] = plan
+    return due
+
+
+async def archive_leaderboards_service(redis, is_still_leader) -> int:
+    """Business Logic to copy the due boards into the archive, one transaction per board.
+
+    Closed days are archived once, boards close to their expiry are replaced on every run until they expire.
+    is_still_leader is checked before each commit so a fenced instance stops writing.
+    Returns the number of archived boards, None once the lease was lost.
+    """
+    due = await find_boards_to_archive(redis)
+    archived = 0
+    async with AsyncSessionLocal() as db:
+        archive_once = [archive_key for archive_key, replace in due.values() if not replace]
+        already_archived = set((await db.scalars(
+            select(LeaderboardArchiveModel.board_key).distinct().filter(LeaderboardArchiveModel.board_key.in_(archive_once))
+        )).all()) if archive_once else set()
+        for board, (archive_key, replace) in sorted(due.items()):
+            if not replace and archive_key in already_archived:
+                continue
+            entries = await read_leaderboard(board, redis, 0, LEADERBOARD_ARCHIVE_MAX_RANK - 1)
+            archived_at = datetime.now()
+            rows = [
+                {"board_key": archive_key, "rank": rank, "user_id": int(user_id), "score": score, "archived_at": archived_at}
+                for rank, (user_id, score) in enumerate(entries, start=1)
+            ]
+            await db.execute(delete(LeaderboardArchiveModel).filter(LeaderboardArchiveModel.board_key == archive_key))
+            for start in range(0, len(rows), ARCHIVE_BATCH_SIZE):
+                await db.execute(insert(LeaderboardArchiveModel), rows[start:start + ARCHIVE_BATCH_SIZE])
+            if not await is_still_leader():
+                await db.rollback()
+                return None
+            await db.commit()
+            archived += 1
+    return archived
+
+
+
+async def read_archived_boards(board_keys: list) -> list:
+    """Business Logic to read every archived entry of the given boards as (user_id, score) pairs"""
+    async with AsyncSessionLocal() as db:
+        entries = (await db.execute(
+            select(LeaderboardArchiveModel.user_id, LeaderboardArchiveModel.score)
+            .filter(LeaderboardArchiveModel.board_key.in_(board_keys))
+        )).all()
+    return [(str(user_id), score) for user_id, score in entries]
+
+
+async def archive_page_service(key: str, offset: int, limit: int, after_user_id=None, around_user_id=None, neighbours: int = 0):
+    """Business Logic to read a page of an archived board by offset, after a cursor's user or around a user"""
+    async with AsyncSessionLocal() as db:
+        query = select(LeaderboardArchiveModel).filter(LeaderboardArchiveModel.board_key == key)
+        anchor_user_id = around_user_id if around_user_id is not None else after_user_id
+        if anchor_user_id is not None:
+            anchor_rank = await db.scalar(select(LeaderboardArchiveModel.rank).filter(
+                LeaderboardArchiveModel.board_key == key,
+                LeaderboardArchiveModel.user_id == int(anchor_user_id)
+            ))
+            if anchor_rank is None:
+                if around_user_id is not None:
+                    raise HTTPException(status_code=404, detail="User not found in this leaderboard")
+                return []
+            if around_user_id is not None:
+                query = query.filter(LeaderboardArchiveModel.rank.between(anchor_rank - neighbours, anchor_rank + neighbours))
+            else:
+                query = query.filter(LeaderboardArchiveModel.rank > anchor_rank).limit(limit)
+        else:
+            query = query.filter(LeaderboardArchiveModel.rank > offset).limit(limit)
+        entries = (await db.scalars(query.order_by(LeaderboardArchiveModel.rank))).all()
+    return [{"rank": entry.rank, "user_id": entry.user_id, "score": entry.score} for entry in entries]
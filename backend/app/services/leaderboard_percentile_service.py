@@ -0,0 +1,101 @@
+"""Service Module for approximate Leaderboard percentiles.
+
+Every board key gets a quantile sketch: the scores found at LEADERBOARD_PERCENTILE_BUCKETS + 1
+evenly spaced ranks, read with pipelined ZRANGE calls (O(log N) each). The sketch is
+stored next to the board, rebuilt once it is older than
+LEADERBOARD_PERCENTILE_REFRESH_SECONDS and mirrored in process, so a lookup is a
+ZSCORE plus a binary search over the boundaries. More buckets give a finer
+percentile, the error is at most 100 / LEADERBOARD_PERCENTILE_BUCKETS points.
+"""
+
+import json, os, time
+
+from bisect import bisect_left, bisect_right
+from fastapi import HTTPException
+from redis.exceptions import RedisError # type: ignore
+
+from ..utils.cache import LocalCache
+from ..utils.sharding import board_shard, board_shards
+
+LEADERBOARD_PERCENTILE_BUCKETS = int(os.getenv("LEADERBOARD_PERCENTILE_BUCKETS", 100))
+LEADERBOARD_PERCENTILE_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_PERCENTILE_REFRESH_SECONDS", 60))
+
+quantile_sketches = LocalCache(1024, LEADERBOARD_PERCENTILE_REFRESH_SECONDS)
+
+
+def quantile_sketch_key(key: str) -> str:
+    return f"{key}:quantiles"
+
+
+async def build_quantile_sketch(key: str, redis) -> dict:
+    """Business Logic to sample the scores at evenly spaced ranks of a sorted set"""
+    members = await redis.zcard(key)
+    ranks = sorted({round(bucket * (members - 1) / LEADERBOARD_PERCENTILE_BUCKETS) for bucket in range(LEADERBOARD_PERCENTILE_BUCKETS + 1)}) if members else []
+    async with redis.pipeline(transaction=False) as pipe:
+        for rank in ranks:
+            pipe.zrange(key, rank, rank, withscores=True)
+        samples = await pipe.execute()
+    sketch = {
+        "built_at": time.time(),
+        "members": members,
+        "ranks": ranks,
+        "scores": [entry[0][1] for entry in samples if entry],
+    }
+    await redis.set(quantile_sketch_key(key), json.dumps(sketch), ex=int(LEADERBOARD_PERCENTILE_REFRESH_SECONDS * 10) or 1)
+    return sketch
+
+
+async def get_quantile_sketch(key: str, redis) -> dict:
+    """Business Logic to fetch the sketch shared by all instances, rebuilding it once it is stale"""
+    async def load_sketch():
+        sketch = await redis.get(quantile_sketch_key(key))
+        sketch = json.loads(sketch) if sketch else None
+        if sketch is None or time.time() - sketch["built_at"] > LEADERBOARD_PERCENTILE_REFRESH_SECONDS:
+            sketch = await build_quantile_sketch(key, redis)
+        return sketch
+
+    return await quantile_sketches.get_or_load(key, key, load_sketch)
+
+
+def members_below(sketch: dict, score: float) -> float:
+    """Estimate how many members score lower than score by interpolating between the sampled ranks"""
+    ranks, scores = sketch["ranks"], sketch["scores"]
+    if not scores or score < scores[0]:
+        return 0
+    if score > scores[-1]:
+        return sketch["members"]
+    lower, upper = bisect_left(scores, score), bisect_right(scores, score)
+    if lower < upper:
+        # The score is one of the samples, count half of the tied span as below it
+        return (ranks[lower] + ranks[upper - 1]) / 2
+    start, end = ranks[lower - 1], ranks[lower]
+    low_score, high_score = scores[lower - 1], scores[lower]
+    return start + (end - start) * (score - low_score) / (high_score - low_score)
+
+
+async def percentile_service(key: str, user_id: int, redis):
+    """Business Logic to estimate which top percentage of a Leaderboard a user is in"""
+    try:
+        score = await redis.zscore(board_shard(key, user_id), user_id)
+        if score is None:
+            raise HTTPException(status_code=404, detail="User not found in this leaderboard")
+        members, below, built_at = 0, 0, None
+        for shard in board_shards(key):
+            sketch = await get_quantile_sketch(shard, redis)
+            members += sketch["members"]
+            below += members_below(sketch, score)
+            built_at = min(built_at or sketch["built_at"], sketch["built_at"])
+        # The user may have joined after the sketch was built
+        members = max(members, 1)
+        return {
+            "leaderboard": key,
+            "user_id": user_id,
+            "score": score,
+            "top_percent": round(min(max(100 * (1 - below / members), 100 / members), 100), 2),
+            "members": members,
+            "sketch_built_at": built_at,
+        }
+    except HTTPException:
+        raise
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
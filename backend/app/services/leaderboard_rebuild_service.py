@@ -0,0 +1,232 @@
+"""Service Module to rebuild the Redis Leaderboards from game_session.
+
+The sessions of the current month (the Leaderboards expire at its end) up to
+the highest game_session id at the start, the cutoff, are streamed with a
+server-side cursor in chunks of LEADERBOARD_REBUILD_CHUNK_ROWS, once every
+transaction that could still commit a session up to the cutoff has finished. Each chunk is
+summed per board, including the dated boards of their start_time, and added to
+the staging boards with pipelined ZINCRBY. Sessions written after the cutoff are
+added to the staging boards by add_game_score_to_redis and the ingest worker.
+Each staging board is swapped in by a script on its own cluster slot, so
+readers see either the old or the rebuilt version of every board shard.
+Progress is kept in the `leaderboard_rebuild:progress` hash.
+"""
+
+import asyncio, json, os, time, uuid
+
+from collections import defaultdict
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import GameSessionModel
+from ..utils.cache import (
+    LEADERBOARD_INVALIDATION_CHANNEL, LEADERBOARD_REBUILD_CUTOFF_KEY, LEADERBOARD_REBUILD_PENDING_CUTOFF,
+    LEADERBOARD_REBUILD_STAGED_KEY, LEADERBOARD_REBUILD_STAGING_TTL_SECONDS, leaderboard_staging_key,
+    leaderboard_version_key
+)
+from ..utils.sharding import board_shard, shard_board
+from ..utils.utils import get_end_of_month_timestamp, get_game_leaderboard_keys, queue_leaderboard_boards
+
+REBUILD_PROGRESS_KEY = "leaderboard_rebuild:progress"
+REBUILD_LOCK_KEY = "leaderboard_rebuild:lock"
+REBUILD_LOCK_SECONDS = 3600
+LEADERBOARD_REBUILD_CHUNK_ROWS = int(os.getenv("LEADERBOARD_REBUILD_CHUNK_ROWS", 5000))
+INVALIDATION_BATCH_BOARDS = 500
+IN_FLIGHT_WAIT_SECONDS = int(os.getenv("LEADERBOARD_REBUILD_IN_FLIGHT_WAIT_SECONDS", 60))
+IN_FLIGHT_POLL_SECONDS = 0.1
+
+# Replace a board shard with its staging board and bump its version. KEYS are the staging
+# board, the shard and its version counter, all in the shard's cluster slot.
+SWAP_STAGING_BOARD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('EXPIREAT', KEYS[2], ARGV[1])
+redis.call('INCR', KEYS[3])
+redis.call('EXPIREAT', KEYS[3], ARGV[1])
+return 1
+"""
+
+
+async def acquire_rebuild_lock():
+    """Business Logic to make sure only one rebuild runs at a time"""
+    redis = await get_redis_client()
+    if not await redis.set(REBUILD_LOCK_KEY, datetime.now().isoformat(), nx=True, ex=REBUILD_LOCK_SECONDS):
+        raise HTTPException(status_code=409, detail="A leaderboard rebuild is already running")
+    await redis.delete(REBUILD_PROGRESS_KEY)
+    await redis.hset(REBUILD_PROGRESS_KEY, mapping={"status": "queued", "queued_at": datetime.now().isoformat()})
+
+
+async def get_rebuild_progress():
+    """Business Logic to fetch the progress of the last rebuild"""
+    redis = await get_redis_client()
+    return await redis.hgetall(REBUILD_PROGRESS_KEY)
+
+
+async def clear_staging_boards(rebuild_id: str):
+    """Business Logic to drop the rebuild's staging boards and stop the writers adding to them"""
+    redis = await get_redis_client()
+    await redis.delete(LEADERBOARD_REBUILD_CUTOFF_KEY)
+    staged = await redis.smembers(LEADERBOARD_REBUILD_STAGED_KEY)
+    async with redis.pipeline(transaction=False) as pipe:
+        for shard in staged:
+            pipe.delete(leaderboard_staging_key(shard, rebuild_id))
+        pipe.delete(LEADERBOARD_REBUILD_STAGED_KEY)
+        await pipe.execute()
+
+
+async def wait_for_in_flight_transactions():
+    """Business Logic to wait until every Postgres transaction running now has committed or rolled back.
+
+    A join can have its session id before the cutoff is read and commit after it, the
+    snapshot streamed once they all finished sees it.
+    """
+    async with AsyncSessionLocal() as db:
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        # Every transaction id below xmax is finished once the oldest running one is at least xmax
+        xmax = await db.scalar(text("SELECT pg_snapshot_xmax(pg_current_snapshot())::text::bigint"))
+        deadline = time.monotonic() + IN_FLIGHT_WAIT_SECONDS
+        while await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")) < xmax:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Transactions started before the cutoff still running after {IN_FLIGHT_WAIT_SECONDS}s")
+            await asyncio.sleep(IN_FLIGHT_POLL_SECONDS)
+
+
+async def take_rebuild_cutoff(rebuild_id: str) -> int:
+    """Business Logic to read the cutoff and hand it to the live writers, returns the cutoff.
+
+    The cutoff is marked pending before the highest session id is read, so a writer
+    committing a later session finds the pending marker or the cutoff and stages its
+    score. Sessions up to the cutoff are streamed, they are only read once the
+    transactions in flight at that point have finished.
+    """
+    redis = await get_redis_client()
+    await redis.set(LEADERBOARD_REBUILD_CUTOFF_KEY, LEADERBOARD_REBUILD_PENDING_CUTOFF, ex=REBUILD_LOCK_SECONDS)
+    async with AsyncSessionLocal() as db:
+        cutoff = await db.scalar(select(func.max(GameSessionModel.id))) or 0
+    await redis.set(LEADERBOARD_REBUILD_CUTOFF_KEY, f"{cutoff}:{rebuild_id}", ex=REBUILD_LOCK_SECONDS)
+    await wait_for_in_flight_transactions()
+    return cutoff
+
+
+async def stage_scores(scores: dict, rebuild_id: str):
+    """Business Logic to add the scores summed from a chunk to the staging boards"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.sadd(LEADERBOARD_REBUILD_STAGED_KEY, *scores)
+        for shard, shard_scores in scores.items():
+            staging_key = leaderboard_staging_key(shard, rebuild_id)
+            for user_id, score in shard_scores.items():
+                pipe.zincrby(staging_key, score, user_id)
+            pipe.expire(staging_key, LEADERBOARD_REBUILD_STAGING_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def swap_staging_boards(rebuild_id: str) -> list:
+    """Business Logic to replace the boards with their staging boards, one script call per shard.
+
+    Shards staged by a writer while swapping are swapped in by the next pass. The cutoff is
+    dropped before the last pass, a writer staging a shard after it only leaves a staging
+    board of this rebuild behind, which expires, its score is already on the live board.
+    Returns the swapped shards.
+    """
+    redis = await get_redis_client()
+    swap = redis.register_script(SWAP_STAGING_BOARD_SCRIPT)
+    expire_at = get_end_of_month_timestamp()
+    swapped = set()
+    cutoff_dropped = False
+    while True:
+        shards = sorted(await redis.smembers(LEADERBOARD_REBUILD_STAGED_KEY) - swapped)
+        if not shards:
+            if cutoff_dropped:
+                break
+            await redis.delete(LEADERBOARD_REBUILD_CUTOFF_KEY)
+            cutoff_dropped = True
+            continue
+        async with redis.pipeline(transaction=False) as pipe:
+            for shard in shards:
+                await swap(keys=[leaderboard_staging_key(shard, rebuild_id), shard, leaderboard_version_key(shard)], args=[expire_at], client=pipe)
+            await pipe.execute()
+        swapped.update(shards)
+    await redis.delete(LEADERBOARD_REBUILD_STAGED_KEY)
+    return sorted(swapped)
+
+
+async def rebuild_leaderboards_service():
+    """Business Logic to rebuild every Leaderboard of the current month from game_session.
+
+    The caller holds the rebuild lock, it is released once the rebuild has finished.
+    """
+    redis = await get_redis_client()
+    rebuild_id = uuid.uuid4().hex
+    started = time.monotonic()
+    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    await redis.hset(REBUILD_PROGRESS_KEY, mapping={"status": "streaming", "started_at": datetime.now().isoformat(), "rows": 0})
+    try:
+        await redis.delete(LEADERBOARD_REBUILD_STAGED_KEY)
+        cutoff = await take_rebuild_cutoff(rebuild_id)
+        boards = set()
+        rows = 0
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(GameSessionModel.user_id, GameSessionModel.game_id, GameSessionModel.score, GameSessionModel.start_time)
+                .filter(
+                    GameSessionModel.id <= cutoff,
+                    GameSessionModel.start_time >= month_start,
+                    GameSessionModel.user_id.isnot(None),
+                    GameSessionModel.game_id.isnot(None)
+                )
+                .execution_options(yield_per=LEADERBOARD_REBUILD_CHUNK_ROWS)
+            )
+            async for chunk in result.partitions():
+                scores = defaultdict(lambda: defaultdict(int))
+                for user_id, game_id, score, start_time in chunk:
+                    for board in get_game_leaderboard_keys(game_id, start_time.date()):
+                        boards.add(board)
+                        scores[board_shard(board, user_id)][user_id] += score or 0
+                await stage_scores(scores, rebuild_id)
+                rows += len(chunk)
+                elapsed = time.monotonic() - started
+                await redis.hset(REBUILD_PROGRESS_KEY, mapping={
+                    "rows": rows,
+                    "boards": len(boards),
+                    "rows_per_second": round(rows / elapsed, 1) if elapsed else rows,
+                })
+                print(f"🔁 Leaderboard rebuild streamed {rows} sessions into {len(boards)} boards")
+
+        await redis.hset(REBUILD_PROGRESS_KEY, "status", "swapping")
+        shards = await swap_staging_boards(rebuild_id)
+        board_names = sorted(boards | {shard_board(shard) for shard in shards})
+        # Redis may have lost the month's board set too, the archive job reads the boards from it
+        if board_names:
+            async with redis.pipeline(transaction=False) as pipe:
+                queue_leaderboard_boards(pipe, board_names, get_end_of_month_timestamp())
+                await pipe.execute()
+        for start in range(0, len(board_names), INVALIDATION_BATCH_BOARDS):
+            await redis.publish(LEADERBOARD_INVALIDATION_CHANNEL, json.dumps(board_names[start:start + INVALIDATION_BATCH_BOARDS]))
+
+        elapsed = time.monotonic() - started
+        progress = {
+            "status": "completed",
+            "finished_at": datetime.now().isoformat(),
+            "cutoff_session_id": cutoff,
+            "rows": rows,
+            "boards": len(board_names),
+            "duration_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else rows,
+        }
+        await redis.hset(REBUILD_PROGRESS_KEY, mapping=progress)
+        print(f"✅ Leaderboard rebuild finished: {rows} sessions, {len(board_names)} boards in {elapsed:.2f}s")
+        return progress
+    except Exception as e:
+        await redis.hset(REBUILD_PROGRESS_KEY, mapping={"status": "failed", "error": str(e), "finished_at": datetime.now().isoformat()})
+        print(f"⚠️ Leaderboard rebuild failed: {str(e)}")
+        await clear_staging_boards(rebuild_id)
+        raise
+    finally:
+        await redis.delete(REBUILD_LOCK_KEY)
@@ -1,36 +1,368 @@
 """Service Module for Leaderboard Routes"""
 
+import asyncio, base64, binascii, orjson, os
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
 from fastapi import HTTPException
 from redis.exceptions import RedisError # type: ignore
 from sqlalchemy.exc import SQLAlchemyError
 
-async def global_leaderboard_service(key, redis):
+from ..utils.cache import leaderboard_cache, leaderboard_snapshots, leaderboard_version_key
+from ..utils.push import leaderboard_hub
+from .leaderboard_archive_service import archive_page_service, is_archived_board, read_archived_boards
+from ..utils.sharding import board_exists, board_shard, board_shards, merge_shard_entries, read_leaderboard
+
+MAX_RANGE_DAYS = 31
+LEADERBOARD_RANGE_TTL_SECONDS = int(os.getenv("LEADERBOARD_RANGE_TTL_SECONDS", 10))
+LEADERBOARD_RANGE_HISTORY_TTL_SECONDS = int(os.getenv("LEADERBOARD_RANGE_HISTORY_TTL_SECONDS", 3600))
+RANGE_UNION_BATCH_SIZE = 1000
+
+# Locates (score, member) in ZREVRANGE order and reads the entries around it in one round trip.
+# Ties are ordered by member descending, so the entries ahead of the anchor are the ones with a
+# higher score plus the tied members that sort after it. When ARGV[2] is empty the member's own
+# score is used (the "around me" lookup). Returns {position, present, score, above, from_anchor}.
+LEADERBOARD_WINDOW_SCRIPT = """
+local key, member, score = KEYS[1], ARGV[1], ARGV[2]
+local above, below = tonumber(ARGV[3]), tonumber(ARGV[4])
+local current = redis.call('ZSCORE', key, member)
+if score == '' then
+  if not current then
+    return false
+  end
+  score = current
+end
+local position, present = 0, 0
+if current and tonumber(current) == tonumber(score) then
+  position = redis.call('ZREVRANK', key, member)
+  present = 1
+else
+  position = redis.call('ZCOUNT', key, '(' .. score, '+inf')
+  for _, tied in ipairs(redis.call('ZREVRANGEBYSCORE', key, score, score)) do
+    if tied > member then
+      position = position + 1
+    end
+  end
+end
+local upper = {}
+if above > 0 and position > 0 then
+  upper = redis.call('ZREVRANGE', key, math.max(position - above, 0), position - 1, 'WITHSCORES')
+end
+local lower = {}
+if present + below > 0 then
+  lower = redis.call('ZREVRANGE', key, position, position + present + below - 1, 'WITHSCORES')
+end
+return {position, present, score, upper, lower}
+"""
+
+
+def encode_leaderboard_cursor(user_id, score) -> str:
+    """Business Logic to build the opaque cursor pointing after a leaderboard entry"""
+    return base64.urlsafe_b64encode(f"{float(score)!r}|{user_id}".encode()).decode()
+
+
+def decode_leaderboard_cursor(cursor: str):
+    """Business Logic to read the (user_id, score) anchor back from a cursor"""
+    try:
+        score, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return user_id, repr(float(score))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid leaderboard cursor")
+
+
+def pair_scores(flat_entries) -> list:
+    """Business Logic to turn a flat [member, score, ...] script reply into (member, score) pairs"""
+    return [(flat_entries[i], float(flat_entries[i + 1])) for i in range(0, len(flat_entries), 2)]
+
+
+def build_leaderboard(entries, first_rank: int) -> list:
+    """Business Logic to render leaderboard entries with their 1-based rank"""
+    return [
+        {"rank": first_rank + position, "user_id": user, "score": score}
+        for position, (user, score) in enumerate(entries)
+    ]
+
+
+async def leaderboard_window_service(key, redis, user_id, score, above: int, below: int):
+    """Business Logic to read the entries around an anchor in a single script call.
+
+    On a sharded board the script runs on every shard in one pipeline, the anchor's
+    global position is the sum of its per-shard positions.
+    """
+    window = redis.register_script(LEADERBOARD_WINDOW_SCRIPT)
+    shards = board_shards(key)
+    if len(shards) == 1:
+        result = await window(keys=[key], args=[user_id, score or "", above, below])
+        if result is None:
+            return None
+        position, present, anchor_score, upper, lower = result
+        return {
+            "position": int(position),
+            "present": bool(present),
+            "score": float(anchor_score),
+            "above": pair_scores(upper),
+            "from_anchor": pair_scores(lower),
+        }
+
+    if not score:
+        score = await redis.zscore(board_shard(key, user_id), user_id)
+        if score is None:
+            return None
+    async with redis.pipeline(transaction=False) as pipe:
+        for shard in shards:
+            await window(keys=[shard], args=[user_id, repr(float(score)), above, below], client=pipe)
+        results = await pipe.execute()
+    present = any(int(result[1]) for result in results)
+    upper = merge_shard_entries([pair_scores(result[3]) for result in results])
+    return {
+        "position": sum(int(result[0]) for result in results),
+        "present": present,
+        "score": float(score),
+        "above": upper[-above:] if above else [],
+        "from_anchor": merge_shard_entries([pair_scores(result[4]) for result in results], 0, int(present) + below - 1),
+    }
+
+
+async def leaderboard_page_service(key, redis, offset: int, limit: int, cursor=None, around_user_id=None, neighbours: int = 0):
+    """Business Logic to fetch a page of a Leaderboard by offset, cursor or around a user.
+
+    Boards of a past day or month are read from the archive once they are gone from Redis.
+    """
+    archived = is_archived_board(key) and not await board_exists(key, redis)
+    if around_user_id is not None:
+        if archived:
+            return await archive_page_service(key, offset, limit, around_user_id=around_user_id, neighbours=neighbours)
+        window = await leaderboard_window_service(key, redis, around_user_id, None, neighbours, neighbours)
+        if window is None:
+            raise HTTPException(status_code=404, detail="User not found in this leaderboard")
+        first_rank = window["position"] - len(window["above"]) + 1
+        return build_leaderboard(window["above"] + window["from_anchor"], first_rank)
+    if cursor:
+        user_id, score = decode_leaderboard_cursor(cursor)
+        if archived:
+            return await archive_page_service(key, offset, limit, after_user_id=user_id)
+        window = await leaderboard_window_service(key, redis, user_id, score, 0, limit)
+        entries = window["from_anchor"][1:] if window["present"] else window["from_anchor"]
+        return build_leaderboard(entries, window["position"] + int(window["present"]) + 1)
+
+    async def load_page():
+        if archived:
+            return await archive_page_service(key, offset, limit)
+        leaderboard_data = await read_leaderboard(key, redis, offset, offset + limit - 1)
+        return build_leaderboard(leaderboard_data, offset + 1)
+
+    return await leaderboard_cache.get_or_load(key, f"{key}:{offset}:{limit}", load_page)
+
+
+async def leaderboard_snapshot_service(key, redis, limit: int, not_found_detail: str):
+    """Business Logic to serve the top of a Leaderboard as pre-rendered JSON bytes.
+
+    The page is rendered once per board version with orjson and reused until the next
+    score change, so hot boards skip the per-row response model validation.
+    Returns the body and the cursor of the next page.
+    """
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for shard in board_shards(key):
+                pipe.get(leaderboard_version_key(shard))
+            version = ".".join(shard_version or "0" for shard_version in await pipe.execute())
+
+        async def render_snapshot():
+            leaderboard = build_leaderboard(await read_leaderboard(key, redis, 0, limit - 1), 1)
+            if not leaderboard and is_archived_board(key):
+                leaderboard = await archive_page_service(key, 0, limit)
+            body = orjson.dumps([
+                {"rank": entry["rank"], "user_id": int(entry["user_id"]), "score": int(entry["score"])}
+                for entry in leaderboard
+            ])
+            next_cursor = None
+            if len(leaderboard) == limit:
+                next_cursor = encode_leaderboard_cursor(leaderboard[-1]["user_id"], leaderboard[-1]["score"])
+            return body, next_cursor
+
+        body, next_cursor = await leaderboard_snapshots.get_or_load(key, f"{key}:{limit}:{version}", render_snapshot)
+        if body == b"[]":
+            raise HTTPException(status_code=404, detail=not_found_detail)
+        return body, next_cursor
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
+
+
+async def global_leaderboard_service(key, redis, offset: int = 0, limit: int = 10, cursor=None, around_user_id=None, neighbours: int = 0):
     """Business Logic to Fetch Global Leaderboard"""
     try:
-        global_leaderboard = key
-        leaderboard_data = await redis.zrevrange(global_leaderboard, 0, 9, withscores=True)
-        if not leaderboard_data:
+        leaderboard = await leaderboard_page_service(key, redis, offset, limit, cursor, around_user_id, neighbours)
+        if not leaderboard and not cursor and not offset:
             raise HTTPException(status_code=404, detail="No global leaderboard data found")
-        leaderboard = [{"user_id": user, "score": score} for user, score in leaderboard_data]
         return leaderboard
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except RedisError as e:
         raise HTTPException(status_code=500, detail="Redis error: " + str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    
 
-async def game_leaderboard_service(key, redis):
+
+async def game_leaderboard_service(key, redis, offset: int = 0, limit: int = 50, cursor=None, around_user_id=None, neighbours: int = 0):
     """Business Logic to fetch Game Leaderboard"""
     try:
-        game_leaderboard = key
-        leaderboard_data = await redis.zrevrange(game_leaderboard, 0, 50, withscores=True)
-        if not leaderboard_data:
+        leaderboard = await leaderboard_page_service(key, redis, offset, limit, cursor, around_user_id, neighbours)
+        if not leaderboard and not cursor and not offset:
             raise HTTPException(status_code=404, detail="No leaderboard data found for this game")
-        leaderboard = [{"user_id": user, "score": score} for user, score in leaderboard_data]
         return leaderboard
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except RedisError as e:
         raise HTTPException(status_code=500, detail="Redis error: " + str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def batch_leaderboard_service(boards: list, redis):
+    """Business Logic to fetch the top of many Leaderboards at once.
+
+    boards is a list of (key, limit) pairs, the pages are returned in the same order. Every
+    page goes through leaderboard_page_service, so cached pages are served locally, sharded
+    boards are merged and past days fall back to the archive. The misses are read concurrently.
+    """
+    try:
+        return list(await asyncio.gather(*(leaderboard_page_service(key, redis, 0, limit) for key, limit in boards)))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
+
+
+async def user_rank_service(user_id: int, keys: list, redis):
+    """Business Logic to fetch a user's rank and score on several Leaderboards in one pipeline.
+
+    The rank on a sharded board needs the user's score first, it is then counted on every
+    shard of every sharded board in a second pipeline, the sum of the per-shard positions.
+    """
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zrevrank(board_shard(key, user_id), user_id)
+                pipe.zscore(board_shard(key, user_id), user_id)
+            results = await pipe.execute()
+        scores = dict(zip(keys, results[1::2]))
+        sharded = [key for key in keys if scores[key] is not None and len(board_shards(key)) > 1]
+        positions = {}
+        if sharded:
+            window = redis.register_script(LEADERBOARD_WINDOW_SCRIPT)
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in sharded:
+                    for shard in board_shards(key):
+                        await window(keys=[shard], args=[user_id, repr(float(scores[key])), 0, 0], client=pipe)
+                shard_results = iter(await pipe.execute())
+            for key in sharded:
+                positions[key] = sum(int(next(shard_results)[0]) for _ in board_shards(key))
+        ranks = []
+        for key, rank, score in zip(keys, results[0::2], results[1::2]):
+            rank = positions.get(key, rank)
+            ranks.append({
+                "leaderboard": key,
+                "rank": rank + 1 if rank is not None else None,
+                "score": score,
+            })
+        return ranks
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
+
+
+def leaderboard_cache_stats_service():
+    """Business Logic to report the hit/miss counters of this process' Leaderboard caches"""
+    return {**leaderboard_cache.stats(), "snapshots": leaderboard_snapshots.stats(), "push": leaderboard_hub.stats()}
+
+
+async def ensure_range_union(redis, range_key: str, sources: list, ttl_seconds: int, archived: list = ()):
+    """Business Logic to sum the source boards into range_key unless a cached union is still alive.
+
+    The sources are in other cluster slots than the union, so they are read in one pipeline
+    and summed in the client instead of with ZUNIONSTORE. The archived boards, days whose
+    board already expired, are read from the archive.
+    """
+    if await redis.exists(range_key):
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for source in sources:
+            pipe.zrange(source, 0, -1, withscores=True)
+        source_entries = await pipe.execute()
+    if archived:
+        source_entries.append(await read_archived_boards(list(archived)))
+    scores = defaultdict(float)
+    for entries in source_entries:
+        for user_id, score in entries:
+            scores[user_id] += score
+    items = list(scores.items())
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(range_key)
+        for start in range(0, len(items), RANGE_UNION_BATCH_SIZE):
+            pipe.zadd(range_key, dict(items[start:start + RANGE_UNION_BATCH_SIZE]))
+        pipe.expire(range_key, ttl_seconds)
+        await pipe.execute()
+
+
+def range_sources(prefix: str, from_date, days: int):
+    """Board shards of the days of a range still in Redis, and the boards of the days read from the archive.
+
+    Daily boards expire at the end of their month, the days of a past month are archived.
+    """
+    month_start = datetime.today().date().replace(day=1)
+    sources, archived = [], []
+    for offset in range(days):
+        day = from_date + timedelta(days=offset)
+        if day < month_start:
+            archived.append(f"{prefix}_{day}")
+        else:
+            sources.extend(board_shards(f"{prefix}_{day}"))
+    return sources, archived
+
+
+async def range_leaderboard_key_service(prefix: str, from_date, to_date, redis):
+    """Business Logic to merge the daily Leaderboards of a date range into a cached union key.
+
+    Past days no longer change, so their union is kept for LEADERBOARD_RANGE_HISTORY_TTL_SECONDS.
+    A range ending today only re-merges today's board into that cached union, and keeps the
+    result for LEADERBOARD_RANGE_TTL_SECONDS. Days of a past month add their archived entries,
+    the top LEADERBOARD_ARCHIVE_MAX_RANK of each day.
+    """
+    try:
+        to_date = min(to_date, datetime.today().date())
+        if from_date > to_date:
+            raise HTTPException(status_code=400, detail="The range start must not be after its end")
+        days = (to_date - from_date).days + 1
+        if days > MAX_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"Date ranges are limited to {MAX_RANGE_DAYS} days")
+        if days == 1:
+            return f"{prefix}_{from_date}"
+
+        range_key = f"{prefix}_range_{from_date}_{to_date}"
+        if to_date < datetime.today().date():
+            sources, archived = range_sources(prefix, from_date, days)
+            await ensure_range_union(redis, range_key, sources, LEADERBOARD_RANGE_HISTORY_TTL_SECONDS, archived)
+        else:
+            yesterday = to_date - timedelta(days=1)
+            sources, archived = range_sources(prefix, from_date, days - 1)
+            if from_date == yesterday and not archived:
+                history_keys = sources
+            else:
+                history_keys = [f"{prefix}_range_{from_date}_{yesterday}"]
+                await ensure_range_union(redis, history_keys[0], sources, LEADERBOARD_RANGE_HISTORY_TTL_SECONDS, archived)
+            await ensure_range_union(redis, range_key, [*history_keys, *board_shards(f"{prefix}_{to_date}")], LEADERBOARD_RANGE_TTL_SECONDS)
+        return range_key
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except RedisError as e:
+        raise HTTPException(status_code=500, detail="Redis error: " + str(e))
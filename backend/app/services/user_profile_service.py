@@ -0,0 +1,70 @@
+"""Service Module for the User Profile cache.
+
+Leaderboards only store user ids, so the display fields of each user are cached
+in the `user_profiles` Redis hash. A page is enriched with a single HMGET, the
+misses are loaded with one IN query and written back in bulk.
+"""
+
+import json
+
+from sqlalchemy import select
+
+from ..configs.database.postgres_config import AsyncSessionLocal
+from ..configs.redis.redis import get_redis_client
+from ..models.postgres_models import UserModel
+
+USER_PROFILES_KEY = "user_profiles"
+# Cached for users that no longer exist, their scores stay on the boards
+MISSING_PROFILE = "{}"
+
+
+def user_profile_entry(user) -> str:
+    return json.dumps({"username": user.username})
+
+
+async def get_user_profiles(user_ids: list) -> dict:
+    """Business Logic to fetch the display fields of many users, by user id"""
+    if not user_ids:
+        return {}
+    redis = await get_redis_client()
+    entries = await redis.hmget(USER_PROFILES_KEY, user_ids)
+    profiles = {user_id: json.loads(entry) for user_id, entry in zip(user_ids, entries) if entry}
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        async with AsyncSessionLocal() as db:
+            users = (await db.scalars(select(UserModel).filter(UserModel.id.in_(missing)))).all()
+        loaded = {user.id: user_profile_entry(user) for user in users}
+        loaded.update({user_id: MISSING_PROFILE for user_id in missing if user_id not in loaded})
+        await redis.hset(USER_PROFILES_KEY, mapping=loaded)
+        profiles.update({user_id: json.loads(entry) for user_id, entry in loaded.items()})
+    return profiles
+
+
+async def enrich_leaderboards(leaderboards: list) -> list:
+    """Business Logic to add the username to every entry of many pages with one profile lookup.
+
+    Pages may be shared with the Leaderboard cache, so the entries are copied.
+    """
+    user_ids = {int(entry["user_id"]) for leaderboard in leaderboards for entry in leaderboard}
+    profiles = await get_user_profiles(list(user_ids))
+    return [
+        [{**entry, "username": profiles.get(int(entry["user_id"]), {}).get("username")} for entry in leaderboard]
+        for leaderboard in leaderboards
+    ]
+
+
+async def enrich_leaderboard(leaderboard: list) -> list:
+    """Business Logic to add the username to every entry of a page"""
+    return (await enrich_leaderboards([leaderboard]))[0]
+
+
+async def cache_user_profile(user):
+    """Business Logic to refresh the cached profile of a created or updated user"""
+    redis = await get_redis_client()
+    await redis.hset(USER_PROFILES_KEY, user.id, user_profile_entry(user))
+
+
+async def drop_user_profile(user_id: int):
+    """Business Logic to drop the cached profile of a deleted user"""
+    redis = await get_redis_client()
+    await redis.hdel(USER_PROFILES_KEY, user_id)
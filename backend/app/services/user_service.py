@@ -3,58 +3,88 @@
 from datetime import datetime
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from ..schemas.postgres_schema import UserCreate, UserUpdate
-from ..models.postgres_models import UserModel
+from ..models.postgres_models import GameSessionModel, UserModel
+from .user_profile_service import cache_user_profile, drop_user_profile
+
+USER_EMAIL_INDEX = "ix_users_email"
 
 
 async def user_create_service(user: UserCreate, db):
-    """Business Logic to Create a New User"""
+    """Business Logic to Create a New User, the inserted row is returned by the INSERT"""
     try:
-        db_user = UserModel(
-            username=user.username,
-            email=user.email,
-            password=user.password,
-            created_at=user.created_at,
-            updated_at=user.updated_at
+        db_user = await db.scalar(
+            insert(UserModel)
+            .values(
+                username=user.username,
+                email=user.email,
+                password=user.password,
+                created_at=user.created_at,
+                updated_at=user.updated_at
+            )
+            .returning(UserModel)
         )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await cache_user_profile(db_user)
         return db_user
+    except IntegrityError as e:
+        await db.rollback()
+        if USER_EMAIL_INDEX in str(e.orig):
+            raise HTTPException(status_code=400, detail="Email already registered")
+        return JSONResponse(status_code=400,content=f"Database Error: {str(e)}")
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         return JSONResponse(status_code=400,content=f"Database Error: {str(e)}")
     except Exception as e:
         return JSONResponse(status_code=500, content=f"Unexpected Error: {str(e)}")
 
 
-async def user_update_service(db_user, user: UserUpdate, db):
-    """Business Logic to Update a User"""
+async def user_update_service(user_id: int, user: UserUpdate, db):
+    """Business Logic to Update a User, empty fields keep their value"""
     try:
-        db_user.username = user.username or db_user.username
-        db_user.email = user.email or db_user.email
-        db_user.password = user.password or db_user.password
-        db_user.updated_at = datetime.now()
-        db.commit()
-        db.refresh(db_user)
+        values = {field: value for field, value in (
+            ("username", user.username),
+            ("email", user.email),
+            ("password", user.password),
+        ) if value}
+        db_user = await db.scalar(
+            update(UserModel)
+            .where(UserModel.id == user_id)
+            .values(**values, updated_at=datetime.now())
+            .returning(UserModel)
+        )
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        await db.commit()
+        await cache_user_profile(db_user)
         return db_user
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Database Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
     
 
-async def user_delete_service(db_user, db):
-    """Business Logic to Delete a User"""
+async def user_delete_service(user_id: int, db):
+    """Business Logic to Delete a User, the user's game sessions are kept without a user"""
     try:
-        db.delete(db_user)
-        db.commit()
+        await db.execute(update(GameSessionModel).where(GameSessionModel.user_id == user_id).values(user_id=None))
+        deleted = await db.scalar(delete(UserModel).where(UserModel.id == user_id).returning(UserModel.id))
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        await db.commit()
+        await drop_user_profile(user_id)
         return {"message": "User deleted successfully"}
+    except HTTPException:
+        await db.rollback()
+        raise
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Database Error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
@@ -0,0 +1,236 @@
+"""In-process Cache Module for hot Leaderboard reads.
+
+Each API process keeps a small TTL cache in front of Redis. Writers publish the
+boards they changed on a Redis pub/sub channel and every process drops its
+cached pages of those boards, so the TTL only bounds staleness when a message
+is lost.
+"""
+
+import asyncio, json, os, time
+
+from collections import OrderedDict, defaultdict
+from fastapi import HTTPException
+
+from ..configs.redis.redis import get_redis_client
+from .sharding import related_key
+
+LEADERBOARD_INVALIDATION_CHANNEL = "leaderboard_invalidations"
+LEADERBOARD_CACHE_MAX_ENTRIES = int(os.getenv("LEADERBOARD_CACHE_MAX_ENTRIES", 1024))
+LEADERBOARD_CACHE_TTL_SECONDS = float(os.getenv("LEADERBOARD_CACHE_TTL_SECONDS", 2))
+LEADERBOARD_SNAPSHOT_MAX_LIMIT = int(os.getenv("LEADERBOARD_SNAPSHOT_MAX_LIMIT", 100))
+LEADERBOARD_SNAPSHOT_TTL_SECONDS = float(os.getenv("LEADERBOARD_SNAPSHOT_TTL_SECONDS", 60))
+RESUBSCRIBE_DELAY_SECONDS = 1
+
+
+class LocalCache:
+    """Size-bounded TTL cache with per-board invalidation and request coalescing"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.board_keys = defaultdict(set)
+        self.board_generations = defaultdict(int)
+        self.loading_boards = defaultdict(int)
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    async def get_or_load(self, board: str, cache_key: str, loader):
+        """Return the cached value, or run loader once for all concurrent callers of the key"""
+        entry = self.entries.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+        in_flight = self.in_flight.get(cache_key)
+        if in_flight:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        # Generations are only tracked for boards with a load in flight, so they stay bounded
+        self.loading_boards[board] += 1
+        generation = self.board_generations[board]
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[cache_key] = future
+        try:
+            value = await loader()
+            # A board changed while we were loading it, the value may already be stale
+            if self.board_generations[board] == generation:
+                self.set(board, cache_key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self.in_flight.pop(cache_key, None)
+            self.loading_boards[board] -= 1
+            if not self.loading_boards[board]:
+                del self.loading_boards[board]
+                del self.board_generations[board]
+
+    def peek(self, cache_key: str):
+        """Return the cached value without loading it, None when missing or expired"""
+        entry = self.entries.get(cache_key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def set(self, board: str, cache_key: str, value):
+        self.entries[cache_key] = (time.monotonic() + self.ttl_seconds, value, board)
+        self.entries.move_to_end(cache_key)
+        self.board_keys[board].add(cache_key)
+        while len(self.entries) > self.max_entries:
+            evicted_key, (_, _, evicted_board) = self.entries.popitem(last=False)
+            self.board_keys[evicted_board].discard(evicted_key)
+            if not self.board_keys[evicted_board]:
+                del self.board_keys[evicted_board]
+            self.evictions += 1
+
+    def invalidate(self, boards):
+        """Drop every cached page of the given boards"""
+        for board in boards:
+            if board in self.loading_boards:
+                self.board_generations[board] += 1
+            for cache_key in self.board_keys.pop(board, set()):
+                if self.entries.pop(cache_key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        for board in self.loading_boards:
+            self.board_generations[board] += 1
+        self.entries.clear()
+        self.board_keys.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+        }
+
+
+"Handlers of the boards published on each pub/sub channel, and of a resubscribe after messages may have been lost"
+INVALIDATION_HANDLERS = defaultdict(list)
+RESET_HANDLERS = []
+
+
+def register_invalidation_handler(channel: str, handler, on_reset=None):
+    """Call handler with the boards of every message published on channel"""
+    INVALIDATION_HANDLERS[channel].append(handler)
+    if on_reset:
+        RESET_HANDLERS.append(on_reset)
+
+
+def register_local_cache(channel: str, cache: LocalCache):
+    """Invalidate the cache from the messages published on channel"""
+    register_invalidation_handler(channel, cache.invalidate, cache.clear)
+
+
+def reset_local_caches():
+    """Drop everything cached locally, messages may have been missed while unsubscribed"""
+    for on_reset in RESET_HANDLERS:
+        on_reset()
+
+
+leaderboard_cache = LocalCache(LEADERBOARD_CACHE_MAX_ENTRIES, LEADERBOARD_CACHE_TTL_SECONDS)
+register_local_cache(LEADERBOARD_INVALIDATION_CHANNEL, leaderboard_cache)
+
+"Rendered top-N pages keyed by board version, a score change bumps the version so no invalidation is needed"
+leaderboard_snapshots = LocalCache(LEADERBOARD_CACHE_MAX_ENTRIES, LEADERBOARD_SNAPSHOT_TTL_SECONDS)
+
+
+def leaderboard_version_key(board: str) -> str:
+    """Counter bumped on every score change of the board, in the board's cluster slot"""
+    return related_key(board, "version")
+
+
+def leaderboard_boards_key(month: str) -> str:
+    """Set of the Leaderboards written in the month (YYYY-MM), the archive job reads it instead of scanning the keyspace"""
+    return f"leaderboard_boards:{month}"
+
+
+"Set to `{cutoff}:{rebuild_id}` while a rebuild streams game_session, sessions with a greater id are added to the staging boards by the live writers"
+LEADERBOARD_REBUILD_CUTOFF_KEY = "leaderboard_rebuild:cutoff"
+"Value of the cutoff key while the rebuild reads the cutoff, writers wait for the actual cutoff"
+LEADERBOARD_REBUILD_PENDING_CUTOFF = "pending"
+"Boards with a staging board, swapped in at the end of the rebuild"
+LEADERBOARD_REBUILD_STAGED_KEY = "leaderboard_rebuild:staged"
+LEADERBOARD_REBUILD_STAGING_TTL_SECONDS = 3600
+REBUILD_CUTOFF_WAIT_SECONDS = 5
+REBUILD_CUTOFF_POLL_SECONDS = 0.05
+
+
+def leaderboard_staging_key(board: str, rebuild_id: str) -> str:
+    """Board written by a rebuild before it is swapped in, in the board's cluster slot.
+
+    Staging boards are named after their rebuild, so one written by a late writer of an
+    earlier rebuild is never swapped in and simply expires.
+    """
+    return related_key(board, f"rebuild:{rebuild_id}")
+
+
+def leaderboard_rebuild_id(cutoff: str, session_id: int):
+    """Id of the running rebuild when the session is after its cutoff and must be staged too, else None"""
+    if not cutoff:
+        return None
+    cutoff_session_id, rebuild_id = cutoff.split(":", 1)
+    return rebuild_id if session_id > int(cutoff_session_id) else None
+
+
+async def get_rebuild_cutoff(redis):
+    """Business Logic to read the cutoff of the running rebuild, None when none runs.
+
+    The rebuild marks the cutoff pending before it reads the highest session id, so a
+    session committed in between is never missed by both the rebuild and its writer.
+    A writer reading the pending marker waits for the cutoff.
+    """
+    deadline = time.monotonic() + REBUILD_CUTOFF_WAIT_SECONDS
+    while True:
+        cutoff = await redis.get(LEADERBOARD_REBUILD_CUTOFF_KEY)
+        if cutoff != LEADERBOARD_REBUILD_PENDING_CUTOFF:
+            return cutoff
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=503, detail="A leaderboard rebuild is starting, retry later")
+        await asyncio.sleep(REBUILD_CUTOFF_POLL_SECONDS)
+
+
+async def listen_for_invalidations():
+    """Background task applying invalidation messages published by any instance"""
+    redis = await get_redis_client()
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(*INVALIDATION_HANDLERS)
+            reset_local_caches()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                boards = json.loads(message["data"])
+                for handler in INVALIDATION_HANDLERS[message["channel"]]:
+                    handler(boards)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Cache invalidation listener error: {str(e)}")
+            reset_local_caches()
+            await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,175 @@
+"""Live Leaderboard push Module.
+
+Clients subscribe to a board over a WebSocket. The boards changed by
+add_game_score_to_redis arrive on the leaderboard invalidation channel and are
+only marked dirty; once per tick every dirty board is read from Redis once,
+diffed against the last pushed top-N and the same message is queued for all of
+its subscribers. Each client has a bounded send queue, a client that falls
+behind is disconnected instead of slowing down the fan-out.
+"""
+
+import asyncio, orjson, os
+
+from collections import defaultdict
+
+from ..configs.redis.redis import get_redis_client
+from .cache import LEADERBOARD_INVALIDATION_CHANNEL, register_invalidation_handler
+from .sharding import board_shards, merge_shard_entries
+
+LEADERBOARD_PUSH_TICK_MS = int(os.getenv("LEADERBOARD_PUSH_TICK_MS", 500))
+LEADERBOARD_PUSH_QUEUE_SIZE = int(os.getenv("LEADERBOARD_PUSH_QUEUE_SIZE", 16))
+LEADERBOARD_PUSH_TOP_N = int(os.getenv("LEADERBOARD_PUSH_TOP_N", 10))
+
+
+class LiveClient:
+    """Send queue of one subscriber, dropped is set once it fell behind"""
+
+    def __init__(self, board: str):
+        self.board = board
+        self.queue = asyncio.Queue(maxsize=LEADERBOARD_PUSH_QUEUE_SIZE)
+        self.dropped = asyncio.Event()
+
+    def push(self, message: bytes) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped.set()
+            return False
+
+
+def render_top(leaderboard_data) -> list:
+    return [
+        {"rank": rank, "user_id": int(user), "score": int(score)}
+        for rank, (user, score) in enumerate(leaderboard_data, start=1)
+    ]
+
+
+def diff_top(previous: list, current: list) -> dict:
+    """Entries whose rank or score changed, and the users that left the top-N"""
+    previous_entries = {entry["user_id"]: entry for entry in previous}
+    current_users = {entry["user_id"] for entry in current}
+    return {
+        "changed": [entry for entry in current if previous_entries.get(entry["user_id"]) != entry],
+        "removed": [user_id for user_id in previous_entries if user_id not in current_users],
+    }
+
+
+class LeaderboardHub:
+    """Tracks the subscribers of every board and pushes coalesced diffs to them"""
+
+    def __init__(self):
+        self.clients = defaultdict(set)
+        self.last_pushed = {}
+        self.dirty = set()
+        self.dropped_clients = 0
+        self.pushed_messages = 0
+
+    def mark_dirty(self, boards):
+        self.dirty.update(board for board in boards if board in self.clients)
+
+    def mark_all_dirty(self):
+        self.dirty.update(self.clients)
+
+    async def subscribe(self, board: str) -> LiveClient:
+        """Register a client and queue the current top-N as its first message"""
+        client = LiveClient(board)
+        if board not in self.last_pushed:
+            self.last_pushed[board] = (await self.read_tops([board]))[0]
+        client.push(orjson.dumps({"type": "snapshot", "board": board, "leaderboard": self.last_pushed[board]}))
+        self.clients[board].add(client)
+        return client
+
+    def unsubscribe(self, client: LiveClient):
+        subscribers = self.clients.get(client.board)
+        if subscribers is None:
+            return
+        subscribers.discard(client)
+        if not subscribers:
+            del self.clients[client.board]
+            self.last_pushed.pop(client.board, None)
+            self.dirty.discard(client.board)
+
+    async def read_tops(self, boards: list) -> list:
+        """Read the top-N of the boards, and of every shard of a sharded board, in one pipeline"""
+        redis = await get_redis_client()
+        async with redis.pipeline(transaction=False) as pipe:
+            for board in boards:
+                for shard in board_shards(board):
+                    pipe.zrevrange(shard, 0, LEADERBOARD_PUSH_TOP_N - 1, withscores=True)
+            results = iter(await pipe.execute())
+        return [
+            render_top(merge_shard_entries([next(results) for _ in board_shards(board)], 0, LEADERBOARD_PUSH_TOP_N - 1))
+            for board in boards
+        ]
+
+    async def flush(self):
+        """Read every dirty board in one pipeline and fan its diff out once"""
+        boards = [board for board in self.dirty if board in self.clients]
+        self.dirty.clear()
+        if not boards:
+            return
+        for board, current in zip(boards, await self.read_tops(boards)):
+            if board not in self.clients:
+                continue
+            diff = diff_top(self.last_pushed.get(board, []), current)
+            self.last_pushed[board] = current
+            if not diff["changed"] and not diff["removed"]:
+                continue
+            message = orjson.dumps({"type": "diff", "board": board, **diff})
+            for client in list(self.clients[board]):
+                if not client.push(message):
+                    self.dropped_clients += 1
+                    self.unsubscribe(client)
+            self.pushed_messages += 1
+
+    async def run(self):
+        """Background task flushing the dirty boards every LEADERBOARD_PUSH_TICK_MS"""
+        while True:
+            await asyncio.sleep(LEADERBOARD_PUSH_TICK_MS / 1000)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Leaderboard push failed: {str(e)}")
+                self.mark_all_dirty()
+
+    def stats(self) -> dict:
+        return {
+            "boards": len(self.clients),
+            "clients": sum(len(subscribers) for subscribers in self.clients.values()),
+            "pushed_messages": self.pushed_messages,
+            "dropped_clients": self.dropped_clients,
+            "tick_ms": LEADERBOARD_PUSH_TICK_MS,
+        }
+
+
+leaderboard_hub = LeaderboardHub()
+register_invalidation_handler(LEADERBOARD_INVALIDATION_CHANNEL, leaderboard_hub.mark_dirty, leaderboard_hub.mark_all_dirty)
+
+
+async def stream_leaderboard(websocket, board: str):
+    """Push the board to a connected WebSocket until it disconnects or falls behind"""
+    await websocket.accept()
+    client = await leaderboard_hub.subscribe(board)
+
+    async def send():
+        while True:
+            message = await client.queue.get()
+            await websocket.send_text(message.decode())
+
+    async def receive():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive()), asyncio.create_task(client.dropped.wait())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        leaderboard_hub.unsubscribe(client)
+    if client.dropped.is_set():
+        # 1013 Try Again Later, the client could not keep up with the updates
+        await websocket.close(code=1013)
@@ -0,0 +1,129 @@
+"""Scheduler Module with Redis lease based leader election.
+
+Every API process runs the scheduler, but only the instance holding the
+`scheduler:leader` lease executes the scheduled jobs. Each new lease gets a
+fencing token from an INCR counter; jobs pass it on to their Redis writes,
+which are rejected once a newer leader has taken over.
+"""
+
+import os, socket, uuid
+
+from datetime import datetime
+from functools import wraps
+from apscheduler.schedulers.asyncio import AsyncIOScheduler # type: ignore
+
+from ..configs.redis.redis import get_redis_client
+
+LEADER_KEY = "scheduler:leader"
+FENCING_TOKEN_KEY = "scheduler:fencing_token"
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", 30))
+LEASE_RENEW_SECONDS = max(LEASE_SECONDS // 3, 1)
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Renew the lease when we hold it, otherwise take it over once it has expired
+ACQUIRE_OR_RENEW_SCRIPT = """
+local holder = redis.call('HGET', KEYS[1], 'instance_id')
+if holder == ARGV[1] then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return tonumber(redis.call('HGET', KEYS[1], 'fencing_token'))
+end
+if holder then
+  return false
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('HSET', KEYS[1], 'instance_id', ARGV[1], 'fencing_token', token, 'acquired_at', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return token
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'instance_id') == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+"""Scheduler to run the background jobs, shared by every worker of this process"""
+scheduler = AsyncIOScheduler()
+
+
+class SchedulerLease:
+    """Leader lease held by this instance"""
+
+    def __init__(self, instance_id: str):
+        self.instance_id = instance_id
+        self.fencing_token = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.fencing_token is not None
+
+    async def heartbeat(self):
+        """Acquire or renew the lease, returns the fencing token while we are leader"""
+        redis = await get_redis_client()
+        try:
+            token = await redis.eval(
+                ACQUIRE_OR_RENEW_SCRIPT, 2, LEADER_KEY, FENCING_TOKEN_KEY,
+                self.instance_id, LEASE_SECONDS * 1000, datetime.now().isoformat()
+            )
+        except Exception as e:
+            print(f"⚠️ Scheduler lease heartbeat failed: {str(e)}")
+            token = None
+        if token is not None and not self.is_leader:
+            print(f"👑 {self.instance_id} is now the scheduler leader (fencing token {token})")
+        elif token is None and self.is_leader:
+            print(f"🔻 {self.instance_id} lost the scheduler lease")
+        self.fencing_token = int(token) if token is not None else None
+        return self.fencing_token
+
+    async def release(self):
+        """Give up the lease on shutdown so another instance can take over right away"""
+        redis = await get_redis_client()
+        await redis.eval(RELEASE_SCRIPT, 1, LEADER_KEY, self.instance_id)
+        self.fencing_token = None
+
+
+lease = SchedulerLease(INSTANCE_ID)
+
+
+def leader_only(job):
+    """Run a scheduled job only on the lease holder and pass it the current fencing token"""
+    @wraps(job)
+    async def wrapper(*args, **kwargs):
+        fencing_token = await lease.heartbeat()
+        if fencing_token is None:
+            return None
+        return await job(*args, fencing_token=fencing_token, **kwargs)
+    return wrapper
+
+
+async def get_scheduler_status():
+    """Business Logic to describe the scheduler leader, local jobs and job metrics"""
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hgetall(LEADER_KEY)
+        pipe.pttl(LEADER_KEY)
+        leader, lease_ttl_ms = await pipe.execute()
+        jobs = scheduler.get_jobs() if scheduler.running else []
+        for job in jobs:
+            pipe.hgetall(f"scheduler_metrics:{job.id}")
+        metrics = await pipe.execute() if jobs else []
+    return {
+        "instance_id": INSTANCE_ID,
+        "is_leader": leader.get("instance_id") == INSTANCE_ID,
+        "leader": {
+            "instance_id": leader.get("instance_id"),
+            "fencing_token": int(leader["fencing_token"]) if leader.get("fencing_token") else None,
+            "acquired_at": leader.get("acquired_at"),
+            "lease_ttl_ms": lease_ttl_ms if lease_ttl_ms > 0 else None,
+        },
+        "jobs": [
+            {
+                "id": job.id,
+                "next_run_time": job.next_run_time.isoformat() if job.next_run_time else None,
+                "metrics": job_metrics,
+            }
+            for job, job_metrics in zip(jobs, metrics)
+        ],
+    }
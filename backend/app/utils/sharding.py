@@ -0,0 +1,82 @@
+"""Sharding Module for the Global Leaderboards.
+
+With LEADERBOARD_GLOBAL_SHARDS > 1 the all-time and daily global boards are
+split into `{board:shard:n}` sub-keys by a hash of the user id. Every shard is
+its own hash tag, and the keys that belong to a board or shard (version
+counter, staging boards) are named with related_key so they share its Redis
+cluster slot. Scripts and MULTIs only ever touch the keys of one slot, anything
+spanning boards or shards is pipelined per slot and merged in the client.
+Readers merge the per-shard pages, every shard is ordered like ZREVRANGE
+(score, then member, descending) so the merge gives the same order as a single
+key. With the default of 1 shard the boards keep their plain key.
+"""
+
+import heapq, os, re, zlib
+
+from itertools import islice
+
+LEADERBOARD_GLOBAL_SHARDS = max(int(os.getenv("LEADERBOARD_GLOBAL_SHARDS", 1)), 1)
+
+SHARDED_BOARD = re.compile(r"^global_leaderboard(_\d{4}-\d{2}-\d{2})?$")
+SHARD_KEY = re.compile(r"^\{(.+):shard:\d+\}$")
+
+
+def is_sharded_board(board: str) -> bool:
+    """Only the all-time and daily global boards are sharded"""
+    return bool(SHARDED_BOARD.match(board))
+
+
+def shard_key(board: str, shard: int) -> str:
+    return f"{{{board}:shard:{shard}}}"
+
+
+def shard_board(key: str) -> str:
+    """Board a physical key belongs to"""
+    match = SHARD_KEY.match(key)
+    return match.group(1) if match else key
+
+
+def related_key(key: str, suffix: str) -> str:
+    """Key derived from key that hashes to the same cluster slot, shard keys already are a hash tag"""
+    return f"{key}:{suffix}" if key.startswith("{") else f"{{{key}}}:{suffix}"
+
+
+def board_shards(board: str, shards: int = LEADERBOARD_GLOBAL_SHARDS) -> list:
+    """Physical keys holding the board"""
+    if shards == 1 or not is_sharded_board(board):
+        return [board]
+    return [shard_key(board, shard) for shard in range(shards)]
+
+
+def board_shard(board: str, user_id, shards: int = LEADERBOARD_GLOBAL_SHARDS) -> str:
+    """Physical key holding the user's score on the board"""
+    if shards == 1 or not is_sharded_board(board):
+        return board
+    return shard_key(board, zlib.crc32(str(user_id).encode()) % shards)
+
+
+def merge_shard_entries(shard_entries, start: int = 0, stop: int = None) -> list:
+    """Merge per-shard (member, score) lists, each in ZREVRANGE order, and slice [start, stop]"""
+    merged = heapq.merge(*shard_entries, key=lambda entry: (entry[1], entry[0]), reverse=True)
+    return list(islice(merged, start, stop + 1 if stop is not None else None))
+
+
+async def board_exists(key, redis) -> bool:
+    """Business Logic to check whether any shard of a board exists, one EXISTS per slot"""
+    shards = board_shards(key)
+    async with redis.pipeline(transaction=False) as pipe:
+        for shard in shards:
+            pipe.exists(shard)
+        return any(await pipe.execute())
+
+
+async def read_leaderboard(key, redis, start: int, stop: int):
+    """Business Logic to read entries [start, stop] of a Leaderboard, merging the top of every shard"""
+    shards = board_shards(key)
+    if len(shards) == 1:
+        return await redis.zrevrange(key, start, stop, withscores=True)
+    async with redis.pipeline(transaction=False) as pipe:
+        for shard in shards:
+            pipe.zrevrange(shard, 0, stop, withscores=True)
+        shard_entries = await pipe.execute()
+    return merge_shard_entries(shard_entries, start, stop)
@@ -1,51 +1,267 @@
-import asyncio, calendar
+import asyncio, calendar, json, os
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+from sqlalchemy import event, text
 
 from ..services.game_service import popularity_index_service
-from ..models.postgres_models import GameModel
+from ..services.game_stats_service import aggregate_game_daily_stats
+from ..services.leaderboard_archive_service import archive_leaderboards_service
+from ..services.game_upvote_service import flush_upvotes_service, get_upvote_counts
 from ..configs.database.postgres_config import SessionLocal
 from ..configs.redis.redis import get_redis_client    
+from .scheduler import LEADER_KEY, lease, leader_only
+from .cache import (
+    LEADERBOARD_INVALIDATION_CHANNEL, LEADERBOARD_REBUILD_STAGED_KEY, LEADERBOARD_REBUILD_STAGING_TTL_SECONDS,
+    get_rebuild_cutoff, leaderboard_boards_key, leaderboard_rebuild_id, leaderboard_staging_key, leaderboard_version_key
+)
+from .sharding import board_shard
 
+POPULARITY_JOB_TIMEOUT_SECONDS = int(os.getenv("POPULARITY_JOB_TIMEOUT_SECONDS", 120))
+JOB_METRICS_HISTORY = 100
 
-async def get_game_popularity_index():
-    """Business logic to Update the Popularity Index"""
+POPULARITY_INDEX_RETENTION_SECONDS = int(os.getenv("POPULARITY_INDEX_RETENTION_SECONDS", 900))
+
+# Swap the staged ranking in only while the caller still holds the current scheduler lease.
+# COPY ... REPLACE is atomic, readers of the live key see either the old or the new ranking.
+FENCED_POPULARITY_SWAP_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'fencing_token') ~= ARGV[1] then
+  redis.call('DEL', KEYS[3])
+  return 0
+end
+if redis.call('EXISTS', KEYS[3]) == 0 then
+  redis.call('DEL', KEYS[2])
+  return 1
+end
+redis.call('COPY', KEYS[3], KEYS[2], 'REPLACE')
+redis.call('PERSIST', KEYS[2])
+return 1
+"""
+
+"Dedicated worker thread for the Popularity Index job, keeps its blocking queries off the event loop"
+popularity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="popularity-index")
+"Run of the worker thread, a timed out run keeps the thread busy until Postgres cancels its statement"
+popularity_run = None
+
+
+def compute_game_popularity_index(timeout_seconds: int, upvote_counts: dict):
+    """Business logic to refresh the daily rollup and compute the Popularity Index.
+
+    Runs on the popularity worker thread with its own DB session, so the blocking
+    queries never touch the API event loop. On Postgres every transaction of the
+    session starts with SET LOCAL statement_timeout, so the timeout ends with the
+    transaction and never reaches the next user of the pooled connection.
+    """
     db = SessionLocal()
+    if db.get_bind().dialect.name == "postgresql":
+        @event.listens_for(db, "after_begin")
+        def set_statement_timeout(session, transaction, connection):
+            connection.execute(text(f"SET LOCAL statement_timeout = {int(timeout_seconds * 1000)}"))
+    try:
+        yesterday = datetime.now().date() - timedelta(days=1)
+        aggregate_game_daily_stats(db)
+        return popularity_index_service(yesterday, db, upvote_counts)
+    finally:
+        db.close()
+
+
+async def record_job_metrics(job_name: str, started_at: datetime, duration: float, status: str):
+    """Business logic to store the duration and outcome of a scheduled job run"""
     redis = await get_redis_client()
+    metrics_key = f"scheduler_metrics:{job_name}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(metrics_key, mapping={
+            "last_run_at": started_at.isoformat(),
+            "last_duration_seconds": round(duration, 3),
+            "last_status": status,
+        })
+        pipe.hincrby(metrics_key, "runs_total", 1)
+        if status != "success":
+            pipe.hincrby(metrics_key, "failures_total", 1)
+        pipe.lpush(f"{metrics_key}:durations", round(duration, 3))
+        pipe.ltrim(f"{metrics_key}:durations", 0, JOB_METRICS_HISTORY - 1)
+        await pipe.execute()
+
+
+@leader_only
+async def get_game_popularity_index(fencing_token: int):
+    """Business logic to Update the Popularity Index.
+
+    asyncio.wait_for only stops waiting for the worker thread, it cannot stop it. A timed
+    out run keeps running until Postgres cancels its statement at statement_timeout, and
+    the next runs are skipped rather than queued behind it.
+    """
+    global popularity_run
+    redis = await get_redis_client()
+    started_at = datetime.now()
+    status = "success"
     try:
-        yesterday_start = datetime.now().date() - timedelta(days=1)
-        yesterday_end = yesterday_start + timedelta(days=1)
-        
-        game_ids = [game.id for game in db.query(GameModel.id).all()]
+        if popularity_run is not None and not popularity_run.done():
+            status = "skipped"
+            print("⚠️ Popularity index skipped, the previous run is still running")
+            return
+        loop = asyncio.get_running_loop()
+        # The worker thread has no Redis client, the fresh upvote counts are read here
+        upvote_counts = await get_upvote_counts()
+        popularity_run = loop.run_in_executor(popularity_executor, compute_game_popularity_index, POPULARITY_JOB_TIMEOUT_SECONDS, upvote_counts)
+        popularity_list = await asyncio.wait_for(asyncio.shield(popularity_run), timeout=POPULARITY_JOB_TIMEOUT_SECONDS)
+
         cache_key = "popularity_index"
-        tasks = [
-            popularity_index_service(game_id, yesterday_start, yesterday_end, db)
-            for game_id in game_ids
-        ]
-        popularity_list = await asyncio.gather(*tasks)
-
-        async with redis.pipeline() as pipe:
-            pipe.delete(cache_key)
-            for item in popularity_list:
-                game_id = item.get('game_id')
-                score = item.get("popularity_index")
-                pipe.zadd(cache_key, {str(game_id):float(score)})
-            await pipe.execute()
+        # Every run is staged under its own versioned key, kept for a short retention period
+        version_key = f"{cache_key}:{int(started_at.timestamp())}"
+        scores = {str(item.get('game_id')): float(item.get("popularity_index")) for item in popularity_list}
+        async with redis.pipeline(transaction=False) as pipe:
+            if scores:
+                pipe.zadd(version_key, scores)
+                pipe.expire(version_key, POPULARITY_INDEX_RETENTION_SECONDS)
+            pipe.eval(FENCED_POPULARITY_SWAP_SCRIPT, 3, LEADER_KEY, cache_key, version_key, fencing_token)
+            published = (await pipe.execute())[-1]
+        if not published:
+            status = "fenced"
+            print(f"⚠️ Popularity index not published, fencing token {fencing_token} is stale")
+            return
         print("🔄 Popularity index updated for all games!")
+    except asyncio.TimeoutError:
+        status = "timeout"
+        print(f"⚠️ Popularity index update exceeded {POPULARITY_JOB_TIMEOUT_SECONDS}s")
     except Exception as e:
+        status = "error"
         print(f"⚠️ Error in popularity index update: {str(e)}")
     finally:
-        db.close()
+        duration = (datetime.now() - started_at).total_seconds()
+        print(f"⏱️ Popularity index job took {duration:.2f}s ({status})")
+        try:
+            await record_job_metrics("popularity_index", started_at, duration, status)
+        except Exception as e:
+            print(f"⚠️ Could not record popularity index job metrics: {str(e)}")
+
+
+@leader_only
+async def archive_leaderboards(fencing_token: int):
+    """Business logic to copy closed and expiring Leaderboards into the Postgres archive"""
+    redis = await get_redis_client()
+    started_at = datetime.now()
+    status = "success"
+
+    async def is_still_leader():
+        return await lease.heartbeat() == fencing_token
+
+    try:
+        archived = await archive_leaderboards_service(redis, is_still_leader)
+        if archived is None:
+            status = "fenced"
+            print(f"⚠️ Leaderboard archive stopped, fencing token {fencing_token} is stale")
+            return
+        print(f"🗄️ Archived {archived} leaderboards")
+    except Exception as e:
+        status = "error"
+        print(f"⚠️ Error in leaderboard archive: {str(e)}")
+    finally:
+        duration = (datetime.now() - started_at).total_seconds()
+        try:
+            await record_job_metrics("leaderboard_archive", started_at, duration, status)
+        except Exception as e:
+            print(f"⚠️ Could not record leaderboard archive job metrics: {str(e)}")
+
+
+@leader_only
+async def flush_upvotes(fencing_token: int):
+    """Business logic to write the upvotes pending in Redis to the games table"""
+    started_at = datetime.now()
+    status = "success"
+    try:
+        flushed = await flush_upvotes_service()
+        if flushed:
+            print(f"👍 Flushed {flushed} upvotes to games")
+    except Exception as e:
+        status = "error"
+        print(f"⚠️ Error in upvote flush: {str(e)}")
+    finally:
+        duration = (datetime.now() - started_at).total_seconds()
+        try:
+            await record_job_metrics("upvote_flush", started_at, duration, status)
+        except Exception as e:
+            print(f"⚠️ Could not record upvote flush job metrics: {str(e)}")
+
+
+def get_game_leaderboard_keys(game_id: int, date) -> list:
+    """Business Logic to list the Sorted Sets a game score is written to"""
+    return [
+        "global_leaderboard",
+        f"game_{game_id}_leaderboard",
+        f"global_leaderboard_{date}",
+        f"game_{game_id}_leaderboard_{date}",
+    ]
+
+
+# Add a session's score to one board shard and bump its version counter. KEYS[3], the
+# staging board of a running rebuild, is only passed for sessions after its cutoff. All
+# keys are in the shard's cluster slot, see related_key.
+ADD_GAME_SCORE_SCRIPT = """
+redis.call('ZINCRBY', KEYS[1], ARGV[2], ARGV[1])
+redis.call('EXPIREAT', KEYS[1], ARGV[3], 'NX')
+redis.call('INCR', KEYS[2])
+redis.call('EXPIREAT', KEYS[2], ARGV[3], 'NX')
+if KEYS[3] then
+  redis.call('ZINCRBY', KEYS[3], ARGV[2], ARGV[1])
+  redis.call('EXPIRE', KEYS[3], ARGV[4])
+end
+"""
+
+
+def game_score_keys(sorted_set: str, user_id: int, rebuild_id=None) -> list:
+    """Keys of ADD_GAME_SCORE_SCRIPT for the user's shard of the board"""
+    shard = board_shard(sorted_set, user_id)
+    keys = [shard, leaderboard_version_key(shard)]
+    if rebuild_id:
+        keys.append(leaderboard_staging_key(shard, rebuild_id))
+    return keys
+
+
+async def queue_game_score(pipe, add_score, sorted_sets: list, user_id: int, score: int, rebuild_id=None):
+    """Business Logic to queue a score on every board with one ADD_GAME_SCORE_SCRIPT call per shard.
+
+    add_score is the registered ADD_GAME_SCORE_SCRIPT. The boards are recorded in the month's
+    board set for the archive job. With a rebuild_id the shards are also added to the
+    rebuild's staged set, so they are swapped in.
+    """
+    expire_at = get_end_of_month_timestamp()
+    shards = []
+    for sorted_set in sorted_sets:
+        keys = game_score_keys(sorted_set, user_id, rebuild_id)
+        shards.append(keys[0])
+        await add_score(keys=keys, args=[user_id, score, expire_at, LEADERBOARD_REBUILD_STAGING_TTL_SECONDS], client=pipe)
+    queue_leaderboard_boards(pipe, sorted_sets, expire_at)
+    if rebuild_id:
+        pipe.sadd(LEADERBOARD_REBUILD_STAGED_KEY, *shards)
+
+
+def queue_leaderboard_boards(pipe, boards: list, expire_at: int):
+    """Business Logic to record boards in the month's board set, which expires with them"""
+    boards_key = leaderboard_boards_key(datetime.fromtimestamp(expire_at).strftime("%Y-%m"))
+    pipe.sadd(boards_key, *boards)
+    pipe.expireat(boards_key, expire_at)
+
 
+async def add_game_score_to_redis(sorted_sets: list, user_id: int, score: int, session_id: int):
+    """Business Logic to Add score to Redis Sorted Sets.
 
-async def add_game_score_to_redis(sorted_set: str, user_id: int, score: int):
-    """Business Logic to Add score to Redis Sorted Sets"""
+    Every board shard is updated by its own script call, pipelined with the invalidation, so
+    no call spans two cluster slots. EXPIREAT NX only sets the end of month expiry on boards
+    that have none yet (Redis >= 7.0). The version counter of each board is bumped for the
+    top-N snapshots, and the changed boards are published so every instance drops its cached
+    pages. Sharded global boards are written to the user's shard, which has its own version
+    counter. While a rebuild runs, sessions after its cutoff are also written to the staging
+    boards so the swap does not drop them.
+    """
     redis = await get_redis_client()
-    await redis.zincrby(sorted_set, score, user_id)
-    ttl = await redis.ttl(sorted_set)
-    if ttl == -1:
-        await redis.expireat(sorted_set, get_end_of_month_timestamp())
+    add_score = redis.register_script(ADD_GAME_SCORE_SCRIPT)
+    rebuild_id = leaderboard_rebuild_id(await get_rebuild_cutoff(redis), session_id)
+    async with redis.pipeline(transaction=False) as pipe:
+        await queue_game_score(pipe, add_score, sorted_sets, user_id, score, rebuild_id)
+        pipe.publish(LEADERBOARD_INVALIDATION_CHANNEL, json.dumps(sorted_sets))
+        await pipe.execute()
 
 
 def get_end_of_month_timestamp():
@@ -0,0 +1,47 @@
+"""Backfill the game_daily_stats rollup from the existing game_session history.
+
+Usage (from the backend directory):
+    python -m scripts.backfill_game_daily_stats
+    python -m scripts.backfill_game_daily_stats --from-date 2025-01-01 --to-date 2025-01-31
+"""
+
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import Date, cast, func
+
+from app.configs.database.postgres_config import SessionLocal
+from app.models.postgres_models import GameSessionModel
+from app.services.game_stats_service import refresh_game_daily_stats
+
+
+def backfill(from_date: date, to_date: date, batch_days: int):
+    db = SessionLocal()
+    try:
+        if from_date is None or to_date is None:
+            first_day, last_day = db.query(
+                func.min(cast(GameSessionModel.start_time, Date)),
+                func.max(cast(GameSessionModel.start_time, Date))
+            ).one()
+            from_date = from_date or first_day
+            to_date = to_date or last_day
+        if from_date is None:
+            print("No game sessions to backfill.")
+            return
+        total_days = (to_date - from_date).days + 1
+        stat_dates = [from_date + timedelta(days=offset) for offset in range(total_days)]
+        for start in range(0, total_days, batch_days):
+            batch = stat_dates[start:start + batch_days]
+            refresh_game_daily_stats(batch, db)
+            print(f"Backfilled {batch[0]} .. {batch[-1]} ({start + len(batch)}/{total_days} days)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-date", type=date.fromisoformat)
+    parser.add_argument("--to-date", type=date.fromisoformat)
+    parser.add_argument("--batch-days", type=int, default=7)
+    args = parser.parse_args()
+    backfill(args.from_date, args.to_date, args.batch_days)
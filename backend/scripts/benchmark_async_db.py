@@ -0,0 +1,70 @@
+"""Concurrency benchmark for the blocking vs async database sessions.
+
+Runs one slow query (pg_sleep) next to a burst of fast queries inside the same
+event loop, first through the sync SessionLocal and then through the async
+AsyncSessionLocal, and reports how long the fast queries had to wait.
+
+Usage (from the backend directory, against Postgres):
+    python -m scripts.benchmark_async_db --fast-requests 10 --slow-seconds 1
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.configs.database.postgres_config import SessionLocal, AsyncSessionLocal, async_engine
+
+
+async def sync_query(statement: str) -> float:
+    "Run a query through a blocking session the way the old routes did"
+    db = SessionLocal()
+    try:
+        db.execute(text(statement))
+    finally:
+        db.close()
+    return time.perf_counter()
+
+
+async def async_query(statement: str) -> float:
+    "Run a query through the async session used by the routes"
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(statement))
+    return time.perf_counter()
+
+
+async def run_scenario(query, fast_requests: int, slow_seconds: float) -> dict:
+    "Fire one slow query and a burst of fast queries at the same moment"
+    await query("SELECT 1")
+    started = time.perf_counter()
+    slow = asyncio.create_task(query(f"SELECT pg_sleep({slow_seconds})"))
+    fast_done = await asyncio.gather(*(query("SELECT 1") for _ in range(fast_requests)))
+    await slow
+    # Latency is measured from the moment all requests arrived
+    fast = [done - started for done in fast_done]
+    return {
+        "wall": time.perf_counter() - started,
+        "fast_p50": statistics.median(fast),
+        "fast_max": max(fast),
+    }
+
+
+async def main(fast_requests: int, slow_seconds: float):
+    results = {
+        "sync session": await run_scenario(sync_query, fast_requests, slow_seconds),
+        "async session": await run_scenario(async_query, fast_requests, slow_seconds),
+    }
+    await async_engine.dispose()
+    print(f"{'mode':<15}{'wall (s)':>10}{'fast p50 (s)':>15}{'fast max (s)':>15}")
+    for mode, result in results.items():
+        print(f"{mode:<15}{result['wall']:>10.3f}{result['fast_p50']:>15.3f}{result['fast_max']:>15.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fast-requests", type=int, default=10)
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.fast_requests, args.slow_seconds))
@@ -0,0 +1,121 @@
+"""Query plan benchmark for the game_session indexes.
+
+Seeds a copy of game_session in a scratch schema, runs the join/exit active
+session lookup and the Popularity Index queries without any index, then with
+the indexes declared on GameSessionModel, and reports the query plans and the
+median latencies. The scratch schema is dropped at the end, the real tables are
+not touched.
+
+Usage (from the backend directory, against Postgres):
+    python -m scripts.benchmark_game_session_indexes --rows 1000000 --runs 20
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.configs.database.postgres_config import engine
+from app.models.postgres_models import GameSessionModel
+
+BENCHMARK_SCHEMA = "game_session_benchmark"
+
+QUERIES = {
+    "active session (join/exit)": """
+        SELECT id FROM game_session
+        WHERE game_id = :game_id AND user_id = :user_id AND game_status = 'STARTED'
+    """,
+    "game sessions in range": """
+        SELECT count(*) FROM game_session
+        WHERE game_id = :game_id AND start_time >= now() - interval '1 day'
+    """,
+    "daily rollup (popularity)": """
+        SELECT game_id, count(DISTINCT user_id) FROM game_session
+        WHERE start_time >= date_trunc('day', now()) - interval '1 day'
+          AND start_time < date_trunc('day', now()) AND game_id IS NOT NULL
+        GROUP BY game_id
+    """,
+    "active sessions per game": """
+        SELECT game_id, count(*) FROM game_session WHERE game_status = 'STARTED' GROUP BY game_id
+    """,
+}
+
+
+def seed(conn, rows: int, games: int, users: int, days: int):
+    "Create the unindexed copy of game_session and fill it, one active session per user and game at most"
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {BENCHMARK_SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {BENCHMARK_SCHEMA}"))
+    conn.execute(text("CREATE TABLE game_session (LIKE public.game_session INCLUDING DEFAULTS)"))
+    # The pairs cycle every games * users rows, only the last cycle is still active
+    conn.execute(text("""
+        INSERT INTO game_session (id, user_id, game_id, score, start_time, end_time, game_status)
+        SELECT n, (n / :games) % :users + 1, n % :games + 1, (n % 21) * 5,
+               now() - (:rows - n) * (:days * interval '1 day' / :rows),
+               CASE WHEN n > :rows - :games * :users THEN NULL
+                    ELSE now() - (:rows - n) * (:days * interval '1 day' / :rows) + interval '5 minutes' END,
+               CASE WHEN n > :rows - :games * :users THEN 'STARTED' ELSE 'COMPLETED' END
+        FROM generate_series(1, :rows) AS n
+    """), {"rows": rows, "games": games, "users": users, "days": days})
+    conn.execute(text("ANALYZE game_session"))
+
+
+def create_indexes(conn):
+    "Create the indexes declared on GameSessionModel on the scratch copy"
+    for index in GameSessionModel.__table__.indexes:
+        if index.name != "ix_game_session_id":
+            index.create(bind=conn)
+    conn.execute(text("ANALYZE game_session"))
+
+
+def run_queries(conn, runs: int, params: dict) -> dict:
+    "Print the plan of every query and return its median latency in milliseconds"
+    latencies = {}
+    for name, query in QUERIES.items():
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params).scalars().all()
+        print(f"\n-- {name}")
+        print("\n".join(plan))
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            conn.execute(text(query), params).all()
+            timings.append((time.perf_counter() - started) * 1000)
+        latencies[name] = statistics.median(timings)
+    return latencies
+
+
+def main(rows: int, games: int, users: int, days: int, runs: int):
+    params = {"game_id": games // 2 + 1, "user_id": users // 2 + 1}
+    with engine.connect() as conn:
+        try:
+            started = time.perf_counter()
+            seed(conn, rows, games, users, days)
+            conn.commit()
+            print(f"🌱 Seeded {rows} sessions in {time.perf_counter() - started:.1f}s")
+
+            print("\n===== without indexes =====")
+            before = run_queries(conn, runs, params)
+            create_indexes(conn)
+            conn.commit()
+            print("\n===== with indexes =====")
+            after = run_queries(conn, runs, params)
+
+            print(f"\n{'query':<30}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+            for name in QUERIES:
+                print(f"{name:<30}{before[name]:>14.2f}{after[name]:>14.2f}{before[name] / after[name]:>9.1f}x")
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.games, args.users, args.days, args.runs)
@@ -0,0 +1,87 @@
+"""Concurrency check for the games_status join counter.
+
+Creates a game and one user per join, starts the game, fires all joins in
+parallel against a running API, ends the game and checks that the
+number_of_users_joined it reports equals the number of successful joins.
+
+Usage (from the backend directory, with the API running):
+    python -m scripts.check_join_counter --joins 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+
+from datetime import datetime
+
+import httpx
+
+
+async def post_limited(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str, **kwargs) -> httpx.Response:
+    async with semaphore:
+        return await client.post(url, **kwargs)
+
+
+async def wait_for_ingest(client: httpx.AsyncClient):
+    "In stream ingest mode the joins are counted by the worker, wait until it has caught up"
+    while True:
+        ingest = (await client.get("/admin/game-sessions/ingest")).json()
+        if not ingest.get("lag") and not ingest.get("pending"):
+            return
+        await asyncio.sleep(0.5)
+
+
+async def run_check(client: httpx.AsyncClient, joins: int, concurrency: int) -> bool:
+    "Fire the joins through the client and compare the reported counter with the successful joins"
+    run_id = uuid.uuid4().hex[:8]
+    now = datetime.now().isoformat()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    game = (await client.post("/games", json={"title": f"join-check-{run_id}", "description": "join counter check", "created_at": now})).json()
+    users = await asyncio.gather(*(
+        post_limited(client, semaphore, "/users", json={
+            "username": f"join-check-{run_id}-{n}",
+            "email": f"join-check-{run_id}-{n}@example.com",
+            "password": "join-check",
+            "created_at": now,
+            "updated_at": now,
+        })
+        for n in range(joins)
+    ))
+    user_ids = [user.json()["id"] for user in users]
+    (await client.post(f"/games/{game['id']}/start")).raise_for_status()
+
+    started = asyncio.get_running_loop().time()
+    responses = await asyncio.gather(*(
+        post_limited(client, semaphore, f"/games/{game['id']}/join", params={"user_id": user_id})
+        for user_id in user_ids
+    ))
+    elapsed = asyncio.get_running_loop().time() - started
+    succeeded = sum(response.status_code in (200, 202) for response in responses)
+    if any(response.status_code == 202 for response in responses):
+        await wait_for_ingest(client)
+
+    game_status = (await client.post(f"/games/{game['id']}/end")).json()
+    counted = game_status["number_of_users_joined"]
+    print(f"{joins} joins in {elapsed:.2f}s ({joins / elapsed:.0f}/s), {succeeded} succeeded, counter {counted}")
+    if counted != succeeded:
+        print("❌ The join counter does not match the successful joins")
+        return False
+    print("✅ The join counter matches the successful joins")
+    return True
+
+
+async def main(base_url: str, joins: int, concurrency: int) -> bool:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        return await run_check(client, joins, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--joins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.base_url, args.joins, args.concurrency)) else 1)
@@ -0,0 +1,20 @@
+"""Rebuild the Redis leaderboards of the current month from the game_session table.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_leaderboards
+
+The same rebuild can be started on a running API with POST /api/v1/admin/leaderboards/rebuild.
+"""
+
+import asyncio
+
+from app.services.leaderboard_rebuild_service import acquire_rebuild_lock, rebuild_leaderboards_service
+
+
+async def rebuild():
+    await acquire_rebuild_lock()
+    await rebuild_leaderboards_service()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
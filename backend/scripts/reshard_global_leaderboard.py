@@ -0,0 +1,94 @@
+"""Re-shard the global leaderboards to a new shard count.
+
+Reads every all-time and daily global board from its current layout (plain key
+and/or `{board:shard:n}` sub-keys, or the `board:shard:n` ones of older
+releases), writes the new layout to staging keys in the slot of each new key
+and swaps every key in with its own MULTI, then drops the keys of the old
+layout. Stop the API instances first, then start them again with
+LEADERBOARD_GLOBAL_SHARDS set to the new count.
+
+Usage (from the backend directory):
+    python -m scripts.reshard_global_leaderboard --shards 8
+    python -m scripts.reshard_global_leaderboard --shards 1
+"""
+
+import argparse, asyncio, json
+
+from collections import defaultdict
+
+from app.configs.redis.redis import get_redis_client
+from app.utils.cache import LEADERBOARD_INVALIDATION_CHANNEL, leaderboard_version_key
+from app.utils.sharding import board_shard, board_shards, is_sharded_board, related_key, shard_board
+
+
+async def find_global_boards(redis) -> dict:
+    """Map every global board to the physical keys currently holding it"""
+    boards = defaultdict(list)
+    async for key in redis.scan_iter(match="*global_leaderboard*", _type="zset"):
+        board = shard_board(key).split(":shard:")[0]
+        if is_sharded_board(board):
+            boards[board].append(key)
+    return boards
+
+
+async def reshard_board(redis, board: str, old_keys: list, shards: int, batch_size: int):
+    scores = defaultdict(float)
+    expire_at = None
+    for key in old_keys:
+        async for user_id, score in redis.zscan_iter(key):
+            scores[user_id] += score
+        key_expire_at = await redis.expiretime(key)
+        if key_expire_at > 0:
+            expire_at = max(expire_at or 0, key_expire_at)
+
+    staged = defaultdict(dict)
+    for user_id, score in scores.items():
+        staged[board_shard(board, user_id, shards)][user_id] = score
+    staging_keys = {key: related_key(key, "reshard") for key in staged}
+    for key, members in staged.items():
+        items = list(members.items())
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.delete(staging_keys[key])
+            for start in range(0, len(items), batch_size):
+                pipe.zadd(staging_keys[key], dict(items[start:start + batch_size]))
+            await pipe.execute()
+
+    new_keys = board_shards(board, shards)
+    for key in new_keys:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.delete(leaderboard_version_key(key))
+            if key in staging_keys:
+                pipe.rename(staging_keys[key], key)
+                if expire_at:
+                    pipe.expireat(key, expire_at)
+            await pipe.execute()
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in set(old_keys) - set(new_keys):
+            pipe.delete(key)
+            pipe.delete(leaderboard_version_key(key))
+        for key in old_keys:
+            pipe.delete(f"{key}:version")
+        pipe.publish(LEADERBOARD_INVALIDATION_CHANNEL, json.dumps([board]))
+        await pipe.execute()
+    print(f"Resharded {board}: {len(scores)} users from {len(old_keys)} keys into {len(new_keys)}")
+
+
+async def reshard(shards: int, batch_size: int):
+    redis = await get_redis_client()
+    boards = await find_global_boards(redis)
+    if not boards:
+        print("No global leaderboards to reshard.")
+        return
+    for board in sorted(boards):
+        await reshard_board(redis, board, boards[board], shards, batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    asyncio.run(reshard(args.shards, args.batch_size))
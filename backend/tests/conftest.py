@@ -0,0 +1,7 @@
+"""Point the app at a scratch SQLite database before it is imported"""
+
+import os, tempfile
+
+os.environ["POSTGRES_URL_RDS"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+# Shard the global boards, so the Leaderboard tests go through the shard merge
+os.environ.setdefault("LEADERBOARD_GLOBAL_SHARDS", "4")
@@ -0,0 +1,157 @@
+"""Tests for the poison handling and the event ordering of the stream ingest"""
+
+import asyncio, json, pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from sqlalchemy import event
+
+from app.configs.database.postgres_config import Base, SessionLocal, async_engine, engine
+from app.models.postgres_models import GameModel, GameSessionModel, GameStatusModel, UserModel
+from app.services import game_session_ingest_service as ingest
+from app.services.game_session_active_service import active_sessions_key
+
+CONSUMER = "test-consumer"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def get_redis_client():
+        return redis
+    monkeypatch.setattr(ingest, "get_redis_client", get_redis_client)
+    return redis
+
+
+@pytest.fixture
+def game(request):
+    """A started game with three users, foreign keys are enforced so a join of an unknown user fails"""
+    def enforce_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+    event.listen(async_engine.sync_engine, "connect", enforce_foreign_keys)
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        game = GameModel(title=request.node.name, description="ingest test")
+        users = [UserModel(username=f"{request.node.name}-{n}", email=f"{request.node.name}-{n}@example.com", password="x") for n in range(3)]
+        db.add_all([game, *users])
+        db.flush()
+        game_status = GameStatusModel(game_id=game.id, number_of_users_joined=0)
+        db.add(game_status)
+        db.commit()
+        yield {"game_id": game.id, "game_status_id": game_status.id, "user_ids": [user.id for user in users]}
+    event.remove(async_engine.sync_engine, "connect", enforce_foreign_keys)
+
+
+def join_fields(game: dict, user_id: int, event_id: str) -> dict:
+    return {"event": json.dumps({
+        "type": "join", "event_id": event_id, "user_id": user_id, "game_id": game["game_id"],
+        "game_status_id": game["game_status_id"], "score": 10, "at": "2026-10-18T10:00:00",
+    })}
+
+
+def exit_fields(game: dict, user_id: int, event_id: str, join_event_id: str) -> dict:
+    return {"event": json.dumps({
+        "type": "exit", "event_id": event_id, "user_id": user_id, "game_id": game["game_id"],
+        "join_event_id": join_event_id, "at": "2026-10-18T10:05:00",
+    })}
+
+
+def run(coroutine):
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run_and_dispose())
+
+
+async def deliver(redis, entries: list) -> list:
+    """Add the entries to the stream and read them as the test consumer"""
+    if not await redis.exists(ingest.GAME_SESSION_STREAM):
+        await redis.xgroup_create(ingest.GAME_SESSION_STREAM, ingest.GAME_SESSION_GROUP, id="0", mkstream=True)
+    for fields in entries:
+        await redis.xadd(ingest.GAME_SESSION_STREAM, fields)
+    response = await redis.xreadgroup(ingest.GAME_SESSION_GROUP, CONSUMER, {ingest.GAME_SESSION_STREAM: ">"})
+    return response[0][1]
+
+
+def written_user_ids(game_id: int) -> list:
+    with SessionLocal() as db:
+        return sorted(user_id for user_id, in db.query(GameSessionModel.user_id).filter(GameSessionModel.game_id == game_id))
+
+
+def test_poison_events_are_isolated_and_dead_lettered(redis, game):
+    user_ids = game["user_ids"]
+    entries = [
+        join_fields(game, user_ids[0], "join-0"),
+        join_fields(game, 10 ** 9, "join-unknown-user"),
+        {"event": "not json"},
+        join_fields(game, user_ids[1], "join-1"),
+        join_fields(game, user_ids[2], "join-2"),
+    ]
+
+    async def ingest_batch():
+        await redis.hset(active_sessions_key(game["game_id"]), mapping={
+            user_ids[0]: "join-0", 10 ** 9: "join-unknown-user", user_ids[1]: "join-1", user_ids[2]: "join-2",
+        })
+        await ingest.process_or_isolate_game_session_entries(await deliver(redis, entries))
+        return (
+            await redis.xrange(ingest.GAME_SESSION_DEAD_LETTER_STREAM),
+            await redis.xpending(ingest.GAME_SESSION_STREAM, ingest.GAME_SESSION_GROUP),
+            await redis.hgetall(active_sessions_key(game["game_id"])),
+        )
+
+    dead, pending, active = run(ingest_batch())
+    assert written_user_ids(game["game_id"]) == sorted(user_ids)
+    assert sorted(fields["event"] for _, fields in dead) == sorted([entries[1]["event"], "not json"])
+    assert pending["pending"] == 0
+    # The dead-lettered join no longer blocks the unknown user, the written ones stay active
+    assert active == {str(user_id): f"join-{n}" for n, user_id in enumerate(user_ids)}
+
+
+def test_errors_after_the_write_are_retried_not_dead_lettered(redis, game, monkeypatch):
+    async def redis_failing(*args, **kwargs):
+        raise ValueError("Leaderboard update failed")
+    monkeypatch.setattr(ingest, "queue_game_score", redis_failing)
+    user_id = game["user_ids"][0]
+
+    async def ingest_batch():
+        await redis.hset(active_sessions_key(game["game_id"]), user_id, "join-retried")
+        with pytest.raises(ValueError):
+            await ingest.process_or_isolate_game_session_entries(await deliver(redis, [join_fields(game, user_id, "join-retried")]))
+        return (
+            await redis.xlen(ingest.GAME_SESSION_DEAD_LETTER_STREAM),
+            await redis.xpending(ingest.GAME_SESSION_STREAM, ingest.GAME_SESSION_GROUP),
+            await redis.hgetall(active_sessions_key(game["game_id"])),
+        )
+
+    dead_letters, pending, active = run(ingest_batch())
+    assert written_user_ids(game["game_id"]) == [user_id]
+    assert dead_letters == 0
+    assert pending["pending"] == 1
+    assert active == {str(user_id): "join-retried"}
+
+
+def test_an_exit_processed_before_its_join_waits_for_it(redis, game, monkeypatch):
+    monkeypatch.setattr(ingest, "GAME_SESSION_INGEST_CLAIM_IDLE_MS", 0)
+    user_id = game["user_ids"][0]
+
+    async def ingest_out_of_order():
+        # Another consumer still holds the join, the exit is read first
+        await ingest.process_or_isolate_game_session_entries(
+            await deliver(redis, [exit_fields(game, user_id, "exit-early", "join-late")])
+        )
+        deferred = await redis.xpending(ingest.GAME_SESSION_STREAM, ingest.GAME_SESSION_GROUP)
+        await ingest.process_or_isolate_game_session_entries(
+            await deliver(redis, [join_fields(game, user_id, "join-late")])
+        )
+        await ingest.claim_game_session_entries("0-0")
+        return deferred, await redis.xpending(ingest.GAME_SESSION_STREAM, ingest.GAME_SESSION_GROUP)
+
+    deferred, pending = run(ingest_out_of_order())
+    assert deferred["pending"] == 1
+    assert pending["pending"] == 0
+    with SessionLocal() as db:
+        session = db.query(GameSessionModel).filter(GameSessionModel.event_id == "join-late").one()
+        assert (session.game_status, session.end_time.isoformat()) == ("COMPLETED", "2026-10-18T10:05:00")
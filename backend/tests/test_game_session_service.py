@@ -0,0 +1,42 @@
+"""Concurrency test for the games_status join counter"""
+
+import asyncio
+
+from app.configs.database.postgres_config import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.models.postgres_models import GameModel, GameSessionModel, GameStatusModel, UserModel
+from app.services import game_session_service
+
+JOINS = 1000
+
+
+def test_parallel_joins_are_all_counted(monkeypatch):
+    async def skip_leaderboards(*args):
+        pass
+    monkeypatch.setattr(game_session_service, "add_game_score_to_redis", skip_leaderboards)
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        game = GameModel(title="join-counter", description="join counter test")
+        users = [UserModel(username=f"joiner-{n}", email=f"joiner-{n}@example.com", password="x") for n in range(JOINS)]
+        db.add_all([game, *users])
+        db.flush()
+        game_status = GameStatusModel(game_id=game.id, number_of_users_joined=0)
+        db.add(game_status)
+        db.commit()
+        game_id, game_status_id, user_ids = game.id, game_status.id, [user.id for user in users]
+
+    async def join(user_id):
+        async with AsyncSessionLocal() as db:
+            await game_session_service.create_game_session_service(user_id, game_id, game_status_id, db)
+
+    async def join_all():
+        try:
+            await asyncio.gather(*(join(user_id) for user_id in user_ids))
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(join_all())
+
+    with SessionLocal() as db:
+        assert db.query(GameSessionModel).filter(GameSessionModel.game_id == game_id).count() == JOINS
+        assert db.get(GameStatusModel, game_status_id).number_of_users_joined == JOINS
@@ -0,0 +1,104 @@
+"""Tests for the write-behind upvote counter"""
+
+import asyncio, pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.configs.database.postgres_config import Base, SessionLocal, async_engine, engine
+from app.models.postgres_models import GameModel, UpvoteFlushModel
+from app.services import game_registry_service, game_upvote_service
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def get_redis_client():
+        return redis
+    monkeypatch.setattr(game_registry_service, "get_redis_client", get_redis_client)
+    monkeypatch.setattr(game_upvote_service, "get_redis_client", get_redis_client)
+    return redis
+
+
+@pytest.fixture
+def game_id(request):
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        game = GameModel(title=request.node.name, description="upvote counter test", upvotes=10)
+        db.add(game)
+        db.commit()
+        return game.id
+
+
+def run(coroutine):
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run_and_dispose())
+
+
+def games_upvotes(game_id: int) -> int:
+    with SessionLocal() as db:
+        return db.get(GameModel, game_id).upvotes
+
+
+def test_registry_reload_keeps_the_pending_upvotes(redis, game_id):
+    async def upvote_then_reload():
+        for _ in range(3):
+            await game_upvote_service.count_upvote(game_id)
+        await game_registry_service.load_game_registry()
+        return await game_upvote_service.count_upvote(game_id)
+
+    assert run(upvote_then_reload()) == 14
+    assert run(game_upvote_service.get_upvote_counts())[game_id] == 14
+
+
+def test_flush_failing_before_its_commit_is_retried(redis, game_id, monkeypatch):
+    open_session = game_upvote_service.AsyncSessionLocal
+
+    def session_failing_to_commit():
+        db = open_session()
+
+        async def commit():
+            raise ConnectionError("Postgres went away")
+        db.commit = commit
+        return db
+
+    for _ in range(5):
+        run(game_upvote_service.count_upvote(game_id))
+    monkeypatch.setattr(game_upvote_service, "AsyncSessionLocal", session_failing_to_commit)
+    with pytest.raises(ConnectionError):
+        run(game_upvote_service.flush_upvotes_service())
+    assert games_upvotes(game_id) == 10
+
+    # The taken counts are still in Redis and count when the game's count is loaded again
+    run(redis.delete(game_registry_service.GAME_UPVOTES_KEY))
+    monkeypatch.setattr(game_upvote_service, "AsyncSessionLocal", open_session)
+    assert run(game_upvote_service.count_upvote(game_id)) == 16
+
+    assert run(game_upvote_service.flush_upvotes_service()) == 6
+    assert games_upvotes(game_id) == 16
+    assert run(game_upvote_service.flush_upvotes_service()) == 0
+    assert games_upvotes(game_id) == 16
+
+
+def test_flush_interrupted_after_its_commit_is_not_added_twice(redis, game_id):
+    for _ in range(4):
+        run(game_upvote_service.count_upvote(game_id))
+    assert run(game_upvote_service.flush_upvotes_service()) == 4
+    assert games_upvotes(game_id) == 14
+
+    # Put the flush's Redis state back as if the instance died before dropping it
+    with SessionLocal() as db:
+        flush_id = db.query(UpvoteFlushModel.flush_id).order_by(UpvoteFlushModel.flushed_at.desc()).first()[0]
+
+    async def restore_flush():
+        await redis.hset(game_upvote_service.upvote_flush_key(flush_id), game_id, 4)
+        await redis.sadd(game_upvote_service.UPVOTE_FLUSHES_KEY, flush_id)
+    run(restore_flush())
+
+    assert run(game_upvote_service.flush_upvotes_service()) == 0
+    assert games_upvotes(game_id) == 14
+    assert run(redis.smembers(game_upvote_service.UPVOTE_FLUSHES_KEY)) == set()
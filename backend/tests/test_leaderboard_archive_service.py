@@ -0,0 +1,69 @@
+"""Tests for the Leaderboard archive planning"""
+
+import asyncio, pytest
+
+from datetime import datetime, timedelta
+
+from app.services.leaderboard_archive_service import archive_plan, find_boards_to_archive
+from app.utils import utils
+
+HOUR_MS = 60 * 60 * 1000
+LEAD_MS = 2 * HOUR_MS
+
+
+def test_last_day_of_month_is_archived_before_it_expires():
+    # The board of the 31st expires at 23:59:59 the same day, it never becomes a closed day
+    now = datetime(2026, 10, 31, 22, 30)
+    assert archive_plan("global_leaderboard_2026-10-31", HOUR_MS, now, LEAD_MS) == ("global_leaderboard_2026-10-31", True)
+    assert archive_plan("game_3_leaderboard_2026-10-31", HOUR_MS, now, LEAD_MS) == ("game_3_leaderboard_2026-10-31", True)
+
+
+def test_todays_board_is_not_due_far_from_expiry():
+    now = datetime(2026, 10, 31, 9, 0)
+    assert archive_plan("global_leaderboard_2026-10-31", 15 * HOUR_MS, now, LEAD_MS) is None
+    assert archive_plan("global_leaderboard_2026-10-18", 13 * 24 * HOUR_MS, datetime(2026, 10, 18, 12), LEAD_MS) is None
+
+
+def test_closed_day_is_archived_once():
+    now = datetime(2026, 10, 19, 0, 5)
+    assert archive_plan("global_leaderboard_2026-10-18", 12 * 24 * HOUR_MS, now, LEAD_MS) == ("global_leaderboard_2026-10-18", False)
+
+
+def test_all_time_board_is_archived_under_its_month():
+    now = datetime(2026, 10, 31, 23, 0)
+    assert archive_plan("game_3_leaderboard", HOUR_MS, now, LEAD_MS) == ("game_3_leaderboard_2026-10", True)
+    assert archive_plan("game_3_leaderboard", 3 * HOUR_MS, now, LEAD_MS) is None
+
+
+def test_boards_without_expiry_and_other_keys_are_not_due():
+    now = datetime(2026, 10, 31, 23, 0)
+    assert archive_plan("global_leaderboard", -1, now, LEAD_MS) is None
+    assert archive_plan("global_leaderboard_range_2026-10-01_2026-10-31", HOUR_MS, now, LEAD_MS) is None
+
+
+def test_boards_to_archive_come_from_the_boards_written_this_month(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def get_redis_client():
+        return redis
+    monkeypatch.setattr(utils, "get_redis_client", get_redis_client)
+
+    async def no_scan(*args, **kwargs):
+        raise AssertionError("The archive job must not scan the keyspace")
+        yield
+    monkeypatch.setattr(redis, "scan_iter", no_scan)
+    yesterday = datetime.now().date() - timedelta(days=1)
+
+    async def due_boards():
+        await utils.add_game_score_to_redis(utils.get_game_leaderboard_keys(3, yesterday), 7, 10, 1)
+        # A board no writer recorded is not a candidate, only the set is read
+        await redis.zadd(f"game_4_leaderboard_{yesterday}", {"7": 10})
+        await redis.expire(f"game_4_leaderboard_{yesterday}", 3600)
+        return await find_boards_to_archive(redis)
+
+    due = asyncio.run(due_boards())
+    assert due == {
+        f"global_leaderboard_{yesterday}": (f"global_leaderboard_{yesterday}", False),
+        f"game_3_leaderboard_{yesterday}": (f"game_3_leaderboard_{yesterday}", False),
+    }
@@ -0,0 +1,110 @@
+"""Tests for the Leaderboard rebuild and the live writers running alongside it"""
+
+import asyncio, pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from datetime import datetime
+
+from app.configs.database.postgres_config import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.models.postgres_models import GameModel, GameSessionModel, UserModel
+from app.services import leaderboard_rebuild_service as rebuild
+from app.utils import utils
+from app.utils.cache import LEADERBOARD_REBUILD_CUTOFF_KEY, LEADERBOARD_REBUILD_PENDING_CUTOFF, get_rebuild_cutoff
+from app.utils.sharding import read_leaderboard
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def get_redis_client():
+        return redis
+    monkeypatch.setattr(rebuild, "get_redis_client", get_redis_client)
+    monkeypatch.setattr(utils, "get_redis_client", get_redis_client)
+    return redis
+
+
+@pytest.fixture
+def game(request):
+    """A game with three users, each with a completed session of this month"""
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        game = GameModel(title=request.node.name, description="rebuild test")
+        users = [UserModel(username=f"{request.node.name}-{n}", email=f"{request.node.name}-{n}@example.com", password="x") for n in range(3)]
+        db.add_all([game, *users])
+        db.flush()
+        db.add_all([
+            GameSessionModel(game_id=game.id, user_id=user.id, score=10 * (n + 1), start_time=datetime.now(), game_status="COMPLETED")
+            for n, user in enumerate(users)
+        ])
+        db.commit()
+        return {"game_id": game.id, "user_ids": [user.id for user in users]}
+
+
+def run(coroutine):
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(run_and_dispose())
+
+
+def monthly_scores(game_id: int = None) -> dict:
+    """Scores of this month summed per user from game_session, what a rebuild must produce"""
+    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    scores = {}
+    with SessionLocal() as db:
+        sessions = db.query(GameSessionModel).filter(
+            GameSessionModel.start_time >= month_start, GameSessionModel.user_id.isnot(None), GameSessionModel.game_id.isnot(None)
+        )
+        if game_id is not None:
+            sessions = sessions.filter(GameSessionModel.game_id == game_id)
+        for session in sessions:
+            scores[str(session.user_id)] = scores.get(str(session.user_id), 0) + float(session.score or 0)
+    return scores
+
+
+def test_scores_staged_during_the_rebuild_survive_the_swap(redis, game, monkeypatch):
+    user_id = game["user_ids"][0]
+
+    async def join_after_the_cutoff():
+        """A live join committed once the cutoff is taken, before the sessions are streamed"""
+        async with AsyncSessionLocal() as db:
+            session = GameSessionModel(game_id=game["game_id"], user_id=user_id, score=25, start_time=datetime.now())
+            db.add(session)
+            await db.commit()
+            boards = utils.get_game_leaderboard_keys(game["game_id"], session.start_time.date())
+            await utils.add_game_score_to_redis(boards, user_id, session.score, session.id)
+    monkeypatch.setattr(rebuild, "wait_for_in_flight_transactions", join_after_the_cutoff)
+
+    async def rebuild_boards():
+        await rebuild.acquire_rebuild_lock()
+        await rebuild.rebuild_leaderboards_service()
+        return (
+            dict(await read_leaderboard(f"game_{game['game_id']}_leaderboard", redis, 0, 10 ** 6)),
+            dict(await read_leaderboard("global_leaderboard", redis, 0, 10 ** 6)),
+            await redis.keys("*rebuild*"),
+        )
+
+    game_board, global_board, leftovers = run(rebuild_boards())
+    assert game_board == monthly_scores(game["game_id"])
+    assert game_board[str(user_id)] == 35
+    assert global_board == monthly_scores()
+    assert leftovers == ["leaderboard_rebuild:progress"]
+
+
+def test_writers_wait_for_a_pending_cutoff(redis):
+    async def read_while_pending():
+        await redis.set(LEADERBOARD_REBUILD_CUTOFF_KEY, LEADERBOARD_REBUILD_PENDING_CUTOFF)
+
+        async def take_cutoff():
+            await asyncio.sleep(0.2)
+            await redis.set(LEADERBOARD_REBUILD_CUTOFF_KEY, "42:rebuild")
+        taking = asyncio.ensure_future(take_cutoff())
+        cutoff = await get_rebuild_cutoff(redis)
+        await taking
+        return cutoff
+
+    assert asyncio.run(read_while_pending()) == "42:rebuild"
@@ -0,0 +1,117 @@
+"""Tests for the sharded Leaderboard reads"""
+
+import asyncio, pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from datetime import datetime, timedelta
+
+from app.configs.database.postgres_config import Base, SessionLocal, async_engine, engine
+from app.models.postgres_models import LeaderboardArchiveModel
+from app.services.leaderboard_service import leaderboard_window_service, range_leaderboard_key_service, user_rank_service
+from app.utils.sharding import board_shard, board_shards, read_leaderboard
+
+BOARD = "global_leaderboard"
+SCORES = {str(user_id): (user_id * 7) % 40 for user_id in range(1, 61)}
+EXPECTED = sorted(((user_id, float(score)) for user_id, score in SCORES.items()), key=lambda entry: (entry[1], entry[0]), reverse=True)
+
+
+async def seeded_redis():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    for user_id, score in SCORES.items():
+        await redis.zadd(board_shard(BOARD, user_id), {user_id: score})
+    return redis
+
+
+def test_board_is_spread_over_its_shards():
+    async def check():
+        redis = await seeded_redis()
+        return [await redis.zcard(shard) for shard in board_shards(BOARD)]
+
+    sizes = asyncio.run(check())
+    assert len(sizes) > 1 and all(sizes) and sum(sizes) == len(SCORES)
+
+
+def test_merged_pages_match_a_single_board():
+    async def pages():
+        redis = await seeded_redis()
+        return [await read_leaderboard(BOARD, redis, start, start + 9) for start in (0, 5, 37, 55)]
+
+    for start, page in zip((0, 5, 37, 55), asyncio.run(pages())):
+        assert page == EXPECTED[start:start + 10]
+
+
+def test_window_around_the_top_of_the_board():
+    # Fewer than `above` entries are ahead of the users ranked 1 to 4
+    async def windows():
+        redis = await seeded_redis()
+        return [await leaderboard_window_service(BOARD, redis, user_id, None, 5, 2) for user_id, _ in EXPECTED[:4]]
+
+    for position, window in enumerate(asyncio.run(windows())):
+        assert window["position"] == position and window["present"]
+        assert window["above"] == EXPECTED[:position]
+        assert window["from_anchor"] == EXPECTED[position:position + 3]
+
+
+def test_window_in_the_middle_of_the_board():
+    async def window():
+        redis = await seeded_redis()
+        return await leaderboard_window_service(BOARD, redis, EXPECTED[30][0], None, 5, 5)
+
+    result = asyncio.run(window())
+    assert result["position"] == 30 and result["present"]
+    assert result["above"] == EXPECTED[25:30]
+    assert result["from_anchor"] == EXPECTED[30:36]
+
+
+def test_user_ranks_count_every_shard_in_two_pipelines():
+    day_board = f"{BOARD}_2001-01-02"
+
+    async def ranks():
+        redis = await seeded_redis()
+        for user_id, score in SCORES.items():
+            await redis.zadd(board_shard(day_board, user_id), {user_id: 40 - score})
+        pipeline = redis.pipeline
+        pipelines = []
+
+        def counted_pipeline(*args, **kwargs):
+            pipelines.append(args)
+            return pipeline(*args, **kwargs)
+        redis.pipeline = counted_pipeline
+        return await user_rank_service(int(EXPECTED[17][0]), [BOARD, day_board, "global_leaderboard_2001-01-01"], redis), len(pipelines)
+
+    (ranked, day_ranked, missing), pipelines = asyncio.run(ranks())
+    day_expected = sorted(((user_id, 40.0 - score) for user_id, score in SCORES.items()), key=lambda entry: (entry[1], entry[0]), reverse=True)
+    assert ranked == {"leaderboard": BOARD, "rank": 18, "score": EXPECTED[17][1]}
+    assert day_ranked["rank"] == day_expected.index((EXPECTED[17][0], 40.0 - EXPECTED[17][1])) + 1
+    assert missing["rank"] is None and missing["score"] is None
+    assert pipelines == 2
+
+
+def test_range_crossing_into_the_previous_month_reads_its_archive():
+    # The daily boards of the previous month expired, only their archived entries are left
+    today = datetime.today().date()
+    month_start = today.replace(day=1)
+    from_date = month_start - timedelta(days=2)
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add_all([
+            LeaderboardArchiveModel(board_key=f"{BOARD}_{day}", rank=rank, user_id=user_id, score=score, archived_at=datetime.now())
+            for day in (from_date, from_date + timedelta(days=1))
+            for rank, (user_id, score) in enumerate([(1, 100.0), (2, 50.0)], start=1)
+        ])
+        db.commit()
+
+    async def range_board():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        for offset in range((today - month_start).days + 1):
+            for user_id in ("1", "3"):
+                await redis.zadd(board_shard(f"{BOARD}_{month_start + timedelta(days=offset)}", user_id), {user_id: 10})
+        try:
+            range_key = await range_leaderboard_key_service(BOARD, from_date, today, redis)
+            return dict(await read_leaderboard(range_key, redis, 0, 100))
+        finally:
+            await async_engine.dispose()
+
+    current_days = (today - month_start).days + 1
+    assert asyncio.run(range_board()) == {"1": 200 + 10.0 * current_days, "2": 100.0, "3": 10.0 * current_days}